@@ -4,10 +4,52 @@ function signatures.
 """
 
 from artifax.builder import *
+from artifax.cache import *
 from artifax.exceptions import *
+from artifax.many import *
 from artifax.models import *
+from artifax.plan import *
+from artifax.report import *
+from artifax.sweeps import *
 from artifax.utils import *
 
 __author__ = "Bruno Lange"
 __email__ = "blangeram@gmail.com"
 __license__ = "MIT"
+
+# artifax.compile is left out of star imports so as not to shadow the builtin
+__all__ = [
+    "Artifax",
+    "At",
+    "Stream",
+    "Vectorized",
+    "build",
+    "iter_build",
+    "abuild",
+    "build_many",
+    "sweep",
+    "process_pool",
+    "thread_pool",
+    "Executor",
+    "Resident",
+    "Plan",
+    "DiskCache",
+    "PickleSerializer",
+    "NumpySerializer",
+    "fingerprint",
+    "content_keys",
+    "BuildReport",
+    "NodeRecord",
+    "CircularDependencyError",
+    "UnresolvedDependencyError",
+    "InvalidSolverError",
+    "NodeSpec",
+    "node_spec",
+    "arglist",
+    "to_graph",
+    "topological_sort",
+    "critical_path",
+    "fusion",
+    "equal",
+    "sizeof",
+]
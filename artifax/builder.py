@@ -3,15 +3,28 @@
 This module hosts the core build function and the private functions that aid it.
 """
 
-from collections import deque
-from functools import partial, reduce
-from operator import ior
+import asyncio
+import inspect
+import os
+import threading
+import time
+import warnings
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from functools import partial
+from heapq import heappop, heappush
+from itertools import count
+from multiprocessing.connection import wait
+from multiprocessing.pool import ThreadPool
+from queue import Queue
 
 import pathos.multiprocessing as mp
-from exos import compose, each
+from exos import each
+from pathos.helpers import mp as _mp
 
 from . import utils as u
 from .exceptions import InvalidSolverError, UnresolvedDependencyError
+from .report import BuildReport, NodeRecord
 
 __author__ = "Bruno Lange"
 __email__ = "blangeram@gmail.com"
@@ -19,16 +32,38 @@ __license__ = "MIT"
 
 
 # pylint: disable=C0103
-_apply = lambda v, *args: (
-    v(*args)
-    if callable(v) and len(u.arglist(v)) == len(args)
-    else partial(v, *args)
-    if callable(v)
-    else v
+_apply = lambda spec, *args: (
+    spec.value(*args)
+    if spec.is_callable and spec.arity == len(args)
+    else partial(spec.value, *args)
+    if spec.is_callable
+    else spec.value
 )
 
 
-def build(artifacts, allow_partial_functions=False, solver="linear", **kwargs):
+_PARALLEL = ("bfs_parallel", "fork", "async", "threads", "distributed")
+
+# estimated run time, in seconds, under which nodes are fused by default
+_CHEAP = 1e-3
+
+
+def build(
+    artifacts,
+    allow_partial_functions=False,
+    solver="linear",
+    resolved=None,
+    durations=None,
+    costs=None,
+    cache=None,
+    previous=None,
+    changed=None,
+    equal=None,
+    keep=None,
+    report=None,
+    on_node_start=None,
+    on_node_end=None,
+    **kwargs
+):
     """Core artifact building function. Given an input dictionary describing the
     computation graph where each vertex correspond to a key and edges can be extracted
     from the function signatures associated with each key, the build function returns
@@ -38,138 +73,1441 @@ def build(artifacts, allow_partial_functions=False, solver="linear", **kwargs):
         allow_partial_functions (bool, optional): Set to True if artifacts are
             allowed to be resolved to partial functions. Defaults to False.
         solver (str, optional): Choose artifax solver strategy. Pick between
-            {'linear', 'bfs', 'bfs_parallel', 'async'}. Defaults to 'linear'.
-        **kwargs: solver-specific keyword arguments.
+            {'linear', 'bfs', 'bfs_parallel', 'fork', 'async', 'threads',
+            'distributed'}. Defaults to 'linear'.
+        resolved (dict, optional): nodes whose values are already known. They
+            are made available to the artifacts that depend on them but are
+            never evaluated themselves.
+        durations (dict, optional): if given, it gets filled with the time, in
+            seconds, that each evaluated node took to run.
+        costs (dict, optional): estimated run time of the nodes, typically the
+            durations recorded by a previous build. When given, the parallel
+            solvers start the ready nodes that head the longest remaining
+            paths first. Nodes without an estimate are assumed to take the
+            average time. Ignored by the serial solvers.
+        cache (artifax.cache.DiskCache, optional): persistent store of node
+            results. Nodes found in it are loaded instead of evaluated and the
+            results of the evaluated nodes are added to it.
+        previous (dict, optional): values of the nodes in an earlier build.
+            Enables early cutoff: a node found in previous keeps its value,
+            without being evaluated, unless it is listed in changed or one of
+            its dependencies changed value during this build.
+        changed (set, optional): nodes whose definitions, or resolved values,
+            changed since previous was built, new nodes included. They are
+            evaluated again. It is updated in place so that, once the build is
+            done, it holds the nodes whose values changed. Nodes missing from
+            previous that are not listed in it are assumed to evaluate to the
+            same values as before if their dependencies did not change.
+        equal (callable, optional): tells whether the new value of a node is
+            the same as its previous one. Defaults to artifax.utils.equal.
+            The values of the nodes evaluated by the 'distributed' solver are
+            not compared, as they are held by its workers: they always change.
+        keep (iterable, optional): nodes whose values must be returned. When
+            given, every other value is dropped as soon as the nodes that
+            depend on it are evaluated, which bounds the memory held by the
+            build by the width of the graph rather than its size, and only
+            the kept nodes are returned.
+        report (artifax.BuildReport, optional): if given, it gets filled with
+            a record of the timings of each evaluated node.
+        on_node_start (callable, optional): called with the name of each node
+            that is about to be evaluated, as it is handed to the solver.
+        on_node_end (callable, optional): called with the name and the
+            artifax.NodeRecord of each evaluated node, as its value is
+            received. Both hooks are called from the thread that runs the
+            build.
+        **kwargs: solver-specific keyword arguments. The 'bfs_parallel',
+            'fork' and 'async' solvers take the number of worker processes
+            through 'processes' and the 'threads' solver takes the number of
+            worker threads through 'max_workers'. All but 'fork' also accept
+            a long-lived 'pool' to run on, which is left open once the build
+            is done. The 'fork' solver forks new workers for every level of
+            the graph, which inherit the values of the nodes built so far
+            rather than receiving them, and is only available where
+            processes can be forked. The 'bfs_parallel' and 'async' solvers
+            ship buffers, i.e. NumPy arrays, bytes, bytearrays and
+            memoryviews, of at least 'shared_memory' bytes, 1 MiB if it is
+            True, to and from their workers through shared memory rather
+            than pickling them, which needs Python 3.8 or later. Arrays and memoryviews reach the workers, and
+            come back from them, as read-only views of shared memory.
+            The 'bfs_parallel' and 'async' solvers evaluate the groups of
+            nodes found by artifax.utils.fusion in single tasks if 'fuse' is
+            set: chains are fused along with the nodes that costs estimates
+            to take at most 'fuse' seconds, or a millisecond if it is True.
+            The 'distributed' solver runs on the workers of the Executor
+            given as 'executor', placing each node on the idle worker that
+            holds most of its inputs.
     """
+    return u.drain(
+        _iter_build(
+            artifacts,
+            allow_partial_functions,
+            solver,
+            resolved=resolved,
+            durations=durations,
+            costs=costs,
+            cache=cache,
+            previous=previous,
+            changed=changed,
+            equal=equal,
+            keep=keep,
+            report=report,
+            on_node_start=on_node_start,
+            on_node_end=on_node_end,
+            **kwargs
+        )
+    )
+
+
+def iter_build(artifacts, *args, **kwargs):
+    """Generator counterpart of the build function, which takes the same
+    arguments. Yields a (node, value) pair for each node as soon as its value
+    is known, in the order the solver completes them: the nodes loaded from
+    the cache come first, then every other node as its evaluation ends or as
+    early cutoff lets it keep its previous value. The dictionary that build
+    would return is the return value of the generator.
+
+    Nodes are only evaluated while the generator is iterated. Closing it, or
+    breaking out of a loop over it, cancels the outstanding work: pools and
+    worker processes started by the build are terminated. Long-lived pools
+    are left running, and the values of the nodes they are still evaluating
+    are discarded.
+
+    The values of the nodes evaluated by the 'distributed' solver are fetched
+    from its workers as they are yielded, whereas build only fetches the ones
+    it returns.
+    """
+    stream = _iter_build(artifacts, *args, **kwargs)
+    return (yield from _fetching(stream, kwargs.get("executor")))
+
+
+def _fetching(stream, executor):
+    """yields the pairs of a build, fetching the values held by the workers of
+    its executor, and returns its result"""
+    try:
+        while True:
+            try:
+                node, value = next(stream)
+            except StopIteration as stop:
+                return stop.value
+            if isinstance(value, Resident):
+                value = executor.fetch(value.worker, value.node)
+            yield node, value
+    finally:
+        stream.close()
+
+
+def _iter_build(
+    artifacts,
+    allow_partial_functions=False,
+    solver="linear",
+    resolved=None,
+    durations=None,
+    costs=None,
+    cache=None,
+    previous=None,
+    changed=None,
+    equal=None,
+    keep=None,
+    report=None,
+    on_node_start=None,
+    on_node_end=None,
+    **kwargs
+):
+    """Generator behind build and iter_build. The values of the nodes held by
+    the workers of the 'distributed' solver are yielded as Resident references
+    and only fetched once the build is done, if they are returned."""
     solvers = {
         "linear": _build_linear,
         "bfs": _build_bfs,
         "bfs_parallel": _build_parallel_bfs,
+        "fork": _build_fork,
         "async": _build_async,
+        "threads": _build_threads,
+        "distributed": _build_distributed,
     }
     if solver not in solvers:
         raise InvalidSolverError("unrecognized solver [{}]".format(solver))
 
-    return solvers[solver](artifacts.copy(), apf=allow_partial_functions, **kwargs)
+    tracer = _tracer(report, on_node_start, on_node_end)
+    store = dict(resolved) if resolved else {}
+    store.update(artifacts)
+    cutoff = _Cutoff(previous, changed, equal) if previous is not None else None
+    if cache is not None:
+        keys = {}
+        hits, artifacts = cache.lookup(store, artifacts, list(artifacts), keys)
+        store.update(hits)
+        for node, value in hits.items():
+            if cutoff is not None:
+                cutoff.record(node, value)
+            yield node, value
+
+    graph = u.to_graph(artifacts)
+    if costs is not None and solver in _PARALLEL:
+        kwargs["ranks"] = u.critical_path(graph, costs)
+    consumers = _Consumers(store, artifacts, keep) if keep is not None else None
+    pipes = _bind_streams(store, artifacts, graph, solver)
+    if solver in ("bfs_parallel", "async"):
+        fuse = kwargs.pop("fuse", None)
+        if fuse:
+            # streaming nodes and their dependents run in the building process
+            streams = [
+                node for node, value in artifacts.items() if isinstance(value, u.Stream)
+            ]
+            kwargs["groups"] = u.fusion(
+                graph,
+                costs,
+                _CHEAP if fuse is True else fuse,
+                exclude=streams + [child for node in streams for child in graph[node]],
+            )
+    stream = solvers[solver](
+        store,
+        graph,
+        apf=allow_partial_functions,
+        durations=durations,
+        cutoff=cutoff,
+        consumers=consumers,
+        tracer=tracer,
+        **kwargs
+    )
+    if pipes is not None:
+        stream = _unpiped(stream, pipes)
+    result = yield from stream
+    if tracer is not None:
+        tracer.finish()
+
+    if cache is not None:
+        cache.save(result, artifacts, keys)
+    return result if consumers is None else consumers.kept(result)
+
 
+async def abuild(
+    artifacts,
+    allow_partial_functions=False,
+    resolved=None,
+    concurrency=None,
+    executor=None,
+    previous=None,
+    changed=None,
+    equal=None,
+    keep=None,
+    report=None,
+    on_node_start=None,
+    on_node_end=None,
+):
+    """Awaitable counterpart of the build function. Nodes are started on the
+    running event loop as soon as their dependencies are resolved. Coroutine
+    functions, or any function that returns an awaitable, are awaited
+    concurrently, which lets I/O-bound graphs overlap their waits.
 
-def _build_linear(artifacts, apf=False):
-    def _reducer(store, node):
-        store[node] = _resolve(node, store, apf=apf)
-        return store
+    Args:
+        allow_partial_functions (bool, optional): Set to True if artifacts are
+            allowed to be resolved to partial functions. Defaults to False.
+        resolved (dict, optional): nodes whose values are already known, see
+            the build function.
+        concurrency (int, optional): maximum number of nodes being evaluated
+            at any given time. Unbounded by default.
+        executor (concurrent.futures.Executor, optional): executor on which
+            plain functions are run. By default, they are called inline on
+            the event loop.
+        previous, changed, equal: early cutoff settings, see the build function.
+        keep (iterable, optional): nodes whose values must be returned, see
+            the build function.
+        report, on_node_start, on_node_end: instrumentation, see the build
+            function. The CPU time of the nodes that are awaited is not
+            recorded.
+    """
+    tracer = _tracer(report, on_node_start, on_node_end)
+    store = dict(resolved) if resolved else {}
+    store.update(artifacts)
+    graph = u.to_graph(artifacts)
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+    cutoff = _Cutoff(previous, changed, equal) if previous is not None else None
+    consumers = _Consumers(store, artifacts, keep) if keep is not None else None
 
-    nodes = compose(u.topological_sort, u.to_graph)(artifacts)
-    return reduce(_reducer, nodes, artifacts)
+    degrees = u.indegrees(graph)
+    ready = [node for node, degree in degrees.items() if not degree]
+    running = {}
+    try:
+        while ready or running:
+            while ready:
+                node = ready.pop()
+                if cutoff is not None and cutoff.holds(node, store):
+                    store[node] = cutoff.previous(node)
+                    if consumers is not None:
+                        consumers.done(node, store)
+                    ready += _release(graph, degrees, [node])
+                    continue
+                if tracer is not None:
+                    tracer.start(node)
+                task = _aresolve(node, store, allow_partial_functions, executor, tracer)
+                if semaphore is not None:
+                    task = _throttled(semaphore, task)
+                running[asyncio.ensure_future(task)] = node
+            if not running:
+                break
 
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                node = running.pop(task)
+                store[node] = task.result()
+                if tracer is not None:
+                    store[node], stamp = store[node]
+                    tracer.end(node, store[node], stamp)
+                if cutoff is not None:
+                    cutoff.record(node, store[node])
+                if consumers is not None:
+                    consumers.done(node, store)
+                ready += _release(graph, degrees, [node])
+    finally:
+        each(lambda task: task.cancel(), running)
 
-def _pendencies(graph, node, done):
-    return {k for k, v in graph.items() if node in v and k not in done}
+    if tracer is not None:
+        tracer.finish()
+    return store if consumers is None else consumers.kept(store)
 
 
-def _build_bfs(artifacts, apf=False):
-    done = set()
-    graph = u.to_graph(artifacts)
-    frontier = deque(u.initial(graph))
+async def _aresolve(node, store, apf, executor, tracer=None):
+    task = _task(node, store, apf=apf)
+    run = _apply if tracer is None else _traced
+    if executor is None:
+        result = run(*task)
+    else:
+        result = await asyncio.get_running_loop().run_in_executor(
+            executor, partial(run, *task)
+        )
+    if tracer is None:
+        return await result if inspect.isawaitable(result) else result
+    value, stamp = result
+    if inspect.isawaitable(value):
+        value = await value
+        stamp = (stamp[0], time.perf_counter(), None, _worker())
+    return value, stamp
+
+
+async def _throttled(semaphore, coroutine):
+    async with semaphore:
+        return await coroutine
+
+
+def _build_linear(
+    artifacts,
+    graph,
+    apf=False,
+    durations=None,
+    cutoff=None,
+    consumers=None,
+    tracer=None,
+):
+    for node in u.topological_sort(graph):
+        value = _resolve(node, artifacts, apf, durations, cutoff, tracer)
+        artifacts[node] = value
+        if consumers is not None:
+            consumers.done(node, artifacts)
+        yield node, value
+
+    return artifacts
+
+
+def _build_bfs(
+    artifacts,
+    graph,
+    apf=False,
+    durations=None,
+    cutoff=None,
+    consumers=None,
+    tracer=None,
+):
+    degrees = u.indegrees(graph)
+    frontier = deque(node for node, degree in degrees.items() if not degree)
     while frontier:
         node = frontier.popleft()
-        artifacts[node] = _resolve(node, artifacts, apf=apf)
-        done.add(node)
-        frontier += [nxt for nxt in graph[node] if not _pendencies(graph, nxt, done)]
+        value = _resolve(node, artifacts, apf, durations, cutoff, tracer)
+        artifacts[node] = value
+        if consumers is not None:
+            consumers.done(node, artifacts)
+        yield node, value
+        frontier += _release(graph, degrees, [node])
 
     return artifacts
 
 
-def _build_parallel_bfs(artifacts, apf=False, processes=None):
-    done = set()
-    graph = u.to_graph(artifacts)
-    frontier = set(u.initial(graph))
-    pool = mp.Pool(processes=processes)
-    while frontier:
-        artifacts.update(
-            {node: pool.apply(_resolve, args=(node, artifacts)) for node in frontier}
-            if len(frontier) > 1
-            else {node: _resolve(node, artifacts, apf=apf) for node in frontier}
-        )
-        done |= frontier
-        frontier = reduce(
-            ior,
-            [
-                {nxt for nxt in graph[node] if not _pendencies(graph, nxt, done)}
-                for node in frontier
-            ],
-            set(),
-        )
+def process_pool(processes=None):
+    """Returns a new pool of worker processes for the parallel solvers. By
+    default, the pool leaves one of the available cores to the main process.
 
+    Args:
+        processes (int, optional): number of worker processes.
+    """
+    return mp.Pool(processes=processes or max(1, mp.cpu_count() - 1))
+
+
+def thread_pool(max_workers=None):
+    """Returns a new pool of worker threads for the threads solver. The default
+    size follows the one of concurrent.futures.ThreadPoolExecutor.
+
+    Args:
+        max_workers (int, optional): number of worker threads.
+    """
+    return ThreadPool(processes=max_workers or min(32, (os.cpu_count() or 1) + 4))
+
+
+@contextmanager
+def _pooling(pool, factory):
+    """yields the given pool, or a new one that is shut down on exit"""
+    if pool is not None:
+        yield pool
+        return
+
+    pool = factory()
+    try:
+        yield pool
+    except BaseException:
+        pool.terminate()
+        raise
     pool.close()
+    pool.join()
+
+
+@contextmanager
+def _sharing(min_bytes):
+    """yields the shared memory transport of a build, or None if min_bytes is
+    None, and unlinks its segments on exit"""
+    if min_bytes is None or min_bytes is False:
+        yield None
+        return
+
+    # shared memory needs Python 3.8, which only these builds require
+    from .transport import SharedMemoryTransport  # pylint: disable=C0415
+
+    transport = SharedMemoryTransport(
+        SharedMemoryTransport.MIN_BYTES if min_bytes is True else min_bytes
+    )
+    try:
+        yield transport
+    finally:
+        transport.close()
+
+
+def _build_parallel_bfs(
+    artifacts,
+    graph,
+    apf=False,
+    durations=None,
+    ranks=None,
+    processes=None,
+    pool=None,
+    shared_memory=None,
+    cutoff=None,
+    consumers=None,
+    tracer=None,
+    groups=None,
+):
+    run = evaluate = _timed if tracer is None else _traced
+    with _sharing(shared_memory) as transport, _pooling(
+        pool, partial(process_pool, processes)
+    ) as pool:
+        if transport is not None:
+            run = transport.wrap(run)
+        degrees = u.indegrees(graph)
+        frontier = [node for node, degree in degrees.items() if not degree]
+        fused = {}
+        while frontier:
+            if ranks:
+                frontier.sort(key=ranks.get, reverse=True)
+            held = []
+            if cutoff is not None:
+                held, frontier = _cut(frontier, artifacts, cutoff)
+                yield from ((node, artifacts[node]) for node in held)
+            shipped, local = _split(frontier, artifacts)
+            done = Queue()
+            for node in shipped:
+                task = _dispatch(node, artifacts, apf, groups, fused, cutoff, evaluate)
+                if tracer is not None:
+                    each(tracer.start, fused.get(node, (node,)))
+                if transport is not None:
+                    task = transport.ship(node, task)
+                pool.apply_async(
+                    run,
+                    task,
+                    callback=partial(_notify, done, node),
+                    error_callback=partial(_notify, done, node, error=True),
+                )
+            for node in local:
+                value = _resolve(node, artifacts, apf, durations, cutoff, tracer)
+                artifacts[node] = value
+                yield node, value
+            landed = []
+            for _ in shipped:
+                node, result, error = done.get()
+                if error:
+                    raise result
+                if transport is not None:
+                    result = transport.receive(node, result)
+                for node, result in _landed(node, result, fused, artifacts, cutoff):
+                    artifacts[node], elapsed = result
+                    if tracer is not None:
+                        elapsed = tracer.end(node, artifacts[node], elapsed)
+                    if durations is not None:
+                        durations[node] = elapsed
+                    if cutoff is not None:
+                        cutoff.record(node, artifacts[node])
+                    landed.append(node)
+                    yield node, artifacts[node]
+            frontier = held + local + landed
+            if consumers is not None:
+                each(lambda node: consumers.done(node, artifacts), frontier)
+            # the members of fused groups are released along with the nodes
+            # they depend on, which are all landed by now
+            landed = set(landed)
+            frontier = [
+                node
+                for node in _release(graph, degrees, frontier)
+                if node not in landed
+            ]
 
     return artifacts
 
 
-def _build_async(artifacts, apf=False, processes=None):
-    graph = u.to_graph(artifacts)
-    frontier = u.initial(graph)
-
-    if not frontier:
-        return {}
-
-    done, rem = set(), set()
-    if processes is None:
-        processes = min(max(1, mp.cpu_count() - 1), len(frontier))
-    pool = mp.Pool(processes=processes)
-
-    each(
-        lambda node: pool.apply_async(
-            partial(_resolve, apf=apf),
-            args=(node, artifacts),
-            callback=partial(_on_done, artifacts, graph, node, done, rem, apf=apf),
-        ),
-        frontier,
+def _build_fork(
+    artifacts,
+    graph,
+    apf=False,
+    durations=None,
+    ranks=None,
+    processes=None,
+    cutoff=None,
+    consumers=None,
+    tracer=None,
+):
+    if "fork" not in _mp.get_all_start_methods():
+        raise InvalidSolverError("the fork solver needs the fork start method")
+    run = _timed if tracer is None else _traced
+    processes = processes or max(1, mp.cpu_count() - 1)
+    degrees = u.indegrees(graph)
+    frontier = [node for node, degree in degrees.items() if not degree]
+    while frontier:
+        if ranks:
+            frontier.sort(key=ranks.get, reverse=True)
+        held = []
+        if cutoff is not None:
+            held, frontier = _cut(frontier, artifacts, cutoff)
+            yield from ((node, artifacts[node]) for node in held)
+        forked, local = _split(frontier, artifacts)
+        for node in local:
+            value = _resolve(node, artifacts, apf, durations, cutoff, tracer)
+            artifacts[node] = value
+            yield node, value
+        if tracer is not None:
+            each(tracer.start, forked)
+        for node, (value, elapsed) in _forked(forked, artifacts, apf, run, processes):
+            artifacts[node] = value
+            if tracer is not None:
+                elapsed = tracer.end(node, value, elapsed)
+            if durations is not None:
+                durations[node] = elapsed
+            if cutoff is not None:
+                cutoff.record(node, value)
+            yield node, value
+        frontier = held + frontier
+        if consumers is not None:
+            each(lambda node: consumers.done(node, artifacts), frontier)
+        frontier = _release(graph, degrees, frontier)
+
+    return artifacts
+
+
+def _forked(nodes, store, apf, run, processes):
+    """Forks up to `processes` workers, which inherit the store, and deals the
+    nodes out to them. Yields each (node, result) pair as soon as the worker
+    that ran the node sends it back. Workers only send back the values of the
+    nodes they evaluate."""
+    context = _mp.get_context("fork")
+    workers, pending = {}, {}
+    try:
+        for share in range(min(processes, len(nodes))):
+            receiver, sender = context.Pipe(duplex=False)
+            worker = context.Process(
+                target=_fork_worker,
+                args=(sender, nodes[share::processes], store, apf, run),
+                daemon=True,
+            )
+            worker.start()
+            sender.close()
+            workers[receiver] = worker
+            pending[receiver] = len(nodes[share::processes])
+        while workers:
+            for receiver in wait(list(workers)):
+                try:
+                    node, result, error = receiver.recv()
+                except EOFError:
+                    worker = workers.pop(receiver)
+                    worker.join()
+                    receiver.close()
+                    if pending[receiver]:
+                        raise ChildProcessError(
+                            "worker exited with code {}".format(worker.exitcode)
+                        ) from None
+                    continue
+                if error:
+                    raise result
+                pending[receiver] -= 1
+                yield node, result
+    finally:
+        for receiver, worker in workers.items():
+            worker.terminate()
+            worker.join()
+            receiver.close()
+
+
+def _fork_worker(sender, nodes, store, apf, run):
+    for node in nodes:
+        try:
+            sender.send((node, run(*_task(node, store, apf=apf)), False))
+        except Exception as error:  # pylint: disable=W0703
+            sender.send((node, error, True))
+            break
+    sender.close()
+
+
+class Executor:
+    """Interface of the executors that the 'distributed' solver runs nodes on.
+    An executor manages a set of workers that evaluate one node at a time each
+    and hold on to the values they produce until they are told to drop them.
+    Values move from one worker to another only when one of them needs a value
+    that the other one holds. See artifax.remote for a reference
+    implementation over sockets.
+    """
+
+    def workers(self):
+        """returns the list of the hashable ids of the workers"""
+        raise NotImplementedError
+
+    def submit(self, worker, node, spec, args, callback):
+        """Evaluates node on worker by applying the function of its
+        artifax.utils.NodeSpec to args, where the values held by workers are
+        given as Resident references. The value is held by worker and, once
+        it is, callback is called, from any thread, with the node, the
+        (start, end, cpu, worker) stamp of its evaluation, the estimated size
+        of its value and None, or with the node, None, None and the exception
+        that its evaluation raised.
+        """
+        raise NotImplementedError
+
+    def fetch(self, worker, node):
+        """returns the value of node held by worker"""
+        raise NotImplementedError
+
+    def drop(self, worker, nodes):
+        """releases the values of the given nodes held by worker"""
+        raise NotImplementedError
+
+
+Resident = namedtuple("Resident", ["node", "worker"])
+Resident.__doc__ = """Reference to the value of a node that is held by a worker of an
+executor rather than by the building process."""
+
+
+def _build_distributed(
+    artifacts,
+    graph,
+    apf=False,
+    durations=None,
+    ranks=None,
+    executor=None,
+    cutoff=None,
+    consumers=None,
+    tracer=None,
+):
+    if executor is None:
+        raise InvalidSolverError("the distributed solver needs an executor")
+    idle = list(executor.workers())
+    if not idle:
+        raise InvalidSolverError("the distributed solver needs workers to run on")
+    done = Queue()
+    degrees = u.indegrees(graph)
+    ready = _Ready((node for node, degree in degrees.items() if not degree), ranks)
+    # nodes waiting for an idle worker, with their arguments
+    queued, tasks = _Ready((), ranks), {}
+    placed, sizes, keys, running = {}, {}, {}, {}
+    try:
+        while ready or queued or running:
+            while ready:
+                node = ready.pop()
+                spec, *args = _task(node, artifacts, apf=apf)
+                keys[node] = spec.args
+                if cutoff is not None and cutoff.holds(node, artifacts):
+                    value = artifacts[node] = cutoff.previous(node)
+                elif _local(node, artifacts):
+                    # streams are evaluated by the building process
+                    if tracer is not None:
+                        tracer.start(node)
+                    args = [_fetched(executor, arg) for arg in args]
+                    value, stamp = _traced(spec, *args)
+                    artifacts[node] = value
+                    elapsed = stamp[1] - stamp[0]
+                    if tracer is not None:
+                        elapsed = tracer.end(node, value, stamp)
+                    if durations is not None:
+                        durations[node] = elapsed
+                    if cutoff is not None:
+                        cutoff.record(node, value)
+                else:
+                    tasks[node] = spec, args
+                    queued.extend([node])
+                    continue
+                if consumers is not None:
+                    _dropping(node, keys, artifacts, placed, executor, consumers)
+                yield node, value
+                ready.extend(_release(graph, degrees, [node]))
+            while queued and idle:
+                node = queued.pop()
+                spec, args = tasks.pop(node)
+                worker = _place(args, idle, sizes)
+                idle.remove(worker)
+                running[node] = worker
+                if tracer is not None:
+                    tracer.start(node)
+                executor.submit(worker, node, spec, args, partial(_arrived, done))
+            if not running:
+                continue
+
+            node, stamp, size, error = done.get()
+            worker = running.pop(node)
+            idle.append(worker)
+            if error is not None:
+                raise error
+            resident = artifacts[node] = placed[node] = Resident(node, worker)
+            sizes[node] = size
+            if tracer is not None:
+                elapsed = tracer.end(node, None, stamp, size)
+            else:
+                elapsed = stamp[1] - stamp[0]
+            if durations is not None:
+                durations[node] = elapsed
+            if cutoff is not None:
+                # comparing the value would bring it over from its worker
+                cutoff.touch(node)
+            # yielded before it is dropped, so that iter_build can fetch it
+            yield node, resident
+            if consumers is not None:
+                _dropping(node, keys, artifacts, placed, executor, consumers)
+            ready.extend(_release(graph, degrees, [node]))
+
+        for node, resident in placed.items():
+            if artifacts.get(node) is resident:
+                artifacts[node] = executor.fetch(resident.worker, node)
+    finally:
+        running = [Resident(node, worker) for node, worker in running.items()]
+        _evict(executor, list(placed.values()) + running)
+
+    return artifacts
+
+
+def _place(args, idle, sizes):
+    """picks the idle worker that already holds the most bytes of the given
+    arguments, the first idle one if none does"""
+    held = {}
+    for arg in args:
+        if isinstance(arg, Resident):
+            held[arg.worker] = held.get(arg.worker, 0) + sizes.get(arg.node, 1)
+    return max(idle, key=lambda worker: held.get(worker, 0))
+
+
+def _fetched(executor, value):
+    if isinstance(value, Resident):
+        return executor.fetch(value.worker, value.node)
+    return value
+
+
+def _arrived(done, node, stamp, size, error):
+    done.put((node, stamp, size, error))
+
+
+def _dropping(node, keys, store, placed, executor, consumers):
+    """lets consumers drop the values that are no longer needed and has the
+    workers release the ones they hold"""
+    consumers.done(node, store)
+    candidates = (node,) + keys.pop(node)
+    _evict(
+        executor,
+        [placed.pop(key) for key in candidates if key in placed and key not in store],
     )
 
-    pool.close()
-    pool.join()
 
-    artifacts.update({n: _resolve(n, artifacts, apf=apf) for n in rem})
+def _evict(executor, residents):
+    workers = {}
+    for resident in residents:
+        workers.setdefault(resident.worker, []).append(resident.node)
+    each(lambda worker: executor.drop(worker, workers[worker]), workers)
+
+
+def _release(graph, degrees, nodes):
+    """decrements the in-degree of the neighbors of the given nodes and
+    returns the ones that have no pending dependencies left"""
+    released = []
+    for node in nodes:
+        for neighbor in graph[node]:
+            degrees[neighbor] -= 1
+            if not degrees[neighbor]:
+                released.append(neighbor)
+    return released
+
+
+def _build_async(
+    artifacts,
+    graph,
+    apf=False,
+    durations=None,
+    ranks=None,
+    processes=None,
+    pool=None,
+    shared_memory=None,
+    cutoff=None,
+    consumers=None,
+    tracer=None,
+    groups=None,
+):
+    with _sharing(shared_memory) as transport, _pooling(
+        pool, partial(process_pool, processes)
+    ) as pool:
+        yield from _completions(
+            artifacts,
+            graph,
+            pool,
+            apf,
+            durations,
+            ranks,
+            cutoff,
+            consumers,
+            tracer,
+            transport,
+            shipped=True,
+            groups=groups,
+        )
+
+    return artifacts
+
+
+def _build_threads(
+    artifacts,
+    graph,
+    apf=False,
+    durations=None,
+    ranks=None,
+    max_workers=None,
+    pool=None,
+    cutoff=None,
+    consumers=None,
+    tracer=None,
+):
+    with _pooling(pool, partial(thread_pool, max_workers)) as pool:
+        yield from _completions(
+            artifacts, graph, pool, apf, durations, ranks, cutoff, consumers, tracer
+        )
 
     return artifacts
 
 
-def _on_done(artifacts, graph, node, done, rem, value, apf=False, **kwargs):
-    done.add(node)
-    artifacts[node] = value
+def _completions(
+    artifacts,
+    graph,
+    pool,
+    apf=False,
+    durations=None,
+    ranks=None,
+    cutoff=None,
+    consumers=None,
+    tracer=None,
+    transport=None,
+    shipped=False,
+    groups=None,
+):
+    """Event-driven scheduler behind the async and threads solvers. Nodes
+    become ready as soon as their last dependency is resolved and are handed
+    to the pool, by decreasing rank if ranks are given, whenever one of its
+    workers is idle. The generator yields each (node, value) pair as soon as
+    the pool hands it back. Nodes held by the cutoff are yielded right away
+    with their previous values. Values that are no longer needed are dropped
+    from artifacts if consumers are tracked. Large buffers are shipped to and
+    from the workers through shared memory if a transport is given. If the
+    pool ships nodes to other processes, the nodes that stream, or consume
+    streams, are evaluated right away instead. Fused groups of nodes are
+    handed to the pool as single tasks.
+    """
+    done = Queue()
+    degrees = u.indegrees(graph)
+    ready = _Ready((node for node, degree in degrees.items() if not degree), ranks)
+    workers = _size(pool)
+    run = evaluate = _timed if tracer is None else _traced
+    if transport is not None:
+        run = transport.wrap(run)
+    running = 0
+    fused, landed = {}, set()
+    while ready or running:
+        while ready and running < workers:
+            node = ready.pop()
+            if cutoff is not None and cutoff.holds(node, artifacts):
+                value = artifacts[node] = cutoff.previous(node)
+            elif shipped and _local(node, artifacts):
+                value = _resolve(node, artifacts, apf, durations, cutoff, tracer)
+                artifacts[node] = value
+            else:
+                task = _dispatch(node, artifacts, apf, groups, fused, cutoff, evaluate)
+                if tracer is not None:
+                    each(tracer.start, fused.get(node, (node,)))
+                if transport is not None:
+                    task = transport.ship(node, task)
+                pool.apply_async(
+                    run,
+                    task,
+                    callback=partial(_notify, done, node),
+                    error_callback=partial(_notify, done, node, error=True),
+                )
+                running += 1
+                continue
+            if consumers is not None:
+                consumers.done(node, artifacts)
+            yield node, value
+            ready.extend(_release(graph, degrees, [node]))
+        if not running:
+            continue
+
+        node, result, error = done.get()
+        running -= 1
+        if error:
+            raise result
+        if transport is not None:
+            result = transport.receive(node, result)
+        landed.update(fused.get(node, ()))
+        for node, (value, elapsed) in _landed(node, result, fused, artifacts, cutoff):
+            artifacts[node] = value
+            if tracer is not None:
+                elapsed = tracer.end(node, value, elapsed)
+            if durations is not None:
+                durations[node] = elapsed
+            if cutoff is not None:
+                cutoff.record(node, value)
+            if consumers is not None:
+                consumers.done(node, artifacts)
+            yield node, value
+            released = _release(graph, degrees, [node])
+            ready.extend(neighbor for neighbor in released if neighbor not in landed)
+
+
+class _Ready:
+    """nodes that are ready to be evaluated. They are handed out by decreasing
+    rank if ranks are given, in FIFO order otherwise."""
+
+    def __init__(self, nodes, ranks=None):
+        self._ranks = ranks
+        self._counter = count()
+        self._queue = [] if ranks else deque()
+        self.extend(nodes)
+
+    def extend(self, nodes):
+        if not self._ranks:
+            self._queue.extend(nodes)
+            return
+        for node in nodes:
+            heappush(self._queue, (-self._ranks[node], next(self._counter), node))
+
+    def pop(self):
+        return heappop(self._queue)[-1] if self._ranks else self._queue.popleft()
+
+    def __len__(self):
+        return len(self._queue)
+
+
+def _size(pool):
+    """number of workers in the pool"""
+    return getattr(pool, "_processes", None) or os.cpu_count() or 1
+
+
+def _notify(done, node, value, error=False):
+    done.put((node, value, error))
 
-    frontier = rem | set(graph[node])
-    batch = {n for n in frontier if not _pendencies(graph, n, done)}
-    rem = frontier - batch
 
-    if not batch:
+def _task(node, store, apf=False):
+    """returns the node spec followed by the values of its arguments, which is
+    all a worker needs to evaluate the node"""
+    spec = u.node_spec(store[node])
+    args = [_subscribed(store[key]) for key in spec.args if key in store]
+    if not apf and len(args) < len(spec.args):
+        raise UnresolvedDependencyError(
+            nodes=[key for key in spec.args if key not in store]
+        )
+    return (spec, *args)
+
+
+def _dispatch(node, store, apf, groups, fused, cutoff, run):
+    """Returns the task of node. If node heads one of the fused groups, the
+    task evaluates the whole group and its members are recorded in fused,
+    unless early cutoff might let any of them keep its previous value."""
+    members = groups.get(node) if groups else None
+    if members is None or (
+        cutoff is not None and not all(map(cutoff.evaluates, members[1:]))
+    ):
+        return _task(node, store, apf=apf)
+
+    fused[node] = members
+    specs = [u.node_spec(store[member]) for member in members]
+    missing = [arg for spec in specs for arg in spec.args if arg not in store]
+    if missing and not apf:
+        raise UnresolvedDependencyError(nodes=missing)
+    names = [
+        arg
+        for arg in dict.fromkeys(arg for spec in specs for arg in spec.args)
+        if arg in store and arg not in members
+    ]
+    group = _Fused(members, specs, names, run)
+    spec = u.NodeSpec(tuple(names), group, False, True, len(names))
+    return (spec, *[_subscribed(store[name]) for name in names])
+
+
+def _landed(node, result, fused, store, cutoff):
+    """Yields the (node, result) pairs of the nodes evaluated by the task of
+    node: the members of its group, in order, if it was fused. Before each
+    member but the first is yielded, the cutoff gets to know whether its
+    dependencies kept their values, as it would have if the member had been
+    evaluated on its own, so results must be recorded as they come."""
+    members = fused.pop(node, None)
+    if members is None:
+        yield node, result
         return
+    for index, (member, outcome) in enumerate(zip(members, result[0])):
+        if index and cutoff is not None:
+            cutoff.holds(member, store)
+        yield member, outcome
+
+
+class _Fused:
+    """Function of the task that evaluates the members of a fused group, one
+    after the other, in a single worker. Called with the values of the names
+    the group depends on, it returns the (value, stamp) results that run
+    returns for each member."""
+
+    def __init__(self, members, specs, names, run):
+        self._members = members
+        self._specs = specs
+        self._names = names
+        self._run = run
+
+    def __call__(self, *values):
+        store = dict(zip(self._names, values))
+        results = []
+        for member, spec in zip(self._members, self._specs):
+            result = self._run(spec, *[store[arg] for arg in spec.args if arg in store])
+            store[member] = result[0]
+            results.append(result)
+        return results
+
+
+def _timed(spec, *args):
+    start = time.perf_counter()
+    value = _apply(spec, *args)
+    return value, time.perf_counter() - start
 
-    pool = mp.Pool(processes=min(max(1, mp.cpu_count() - 1), len(batch)))
-
-    each(
-        lambda node: pool.apply_async(
-            _resolve,
-            args=(node, artifacts),
-            callback=partial(
-                _on_done, artifacts, graph, node, done, rem, apf=apf, **kwargs
-            ),
-        ),
-        batch,
+
+def _traced(spec, *args):
+    """evaluates a node and returns its value along with a (start, end, cpu,
+    worker) stamp"""
+    start, cpu = time.perf_counter(), time.thread_time()
+    value = _apply(spec, *args)
+    end = time.perf_counter()
+    return value, (start, end, time.thread_time() - cpu, _worker())
+
+
+def _worker():
+    return os.getpid(), threading.get_ident()
+
+
+def _resolve(node, store, apf=False, durations=None, cutoff=None, tracer=None):
+    if cutoff is not None and cutoff.holds(node, store):
+        return cutoff.previous(node)
+    if tracer is not None:
+        tracer.start(node)
+        value, stamp = _traced(*_task(node, store, apf=apf))
+        elapsed = tracer.end(node, value, stamp)
+        if durations is not None:
+            durations[node] = elapsed
+    elif durations is None:
+        value = _apply(*_task(node, store, apf=apf))
+    else:
+        value, durations[node] = _timed(*_task(node, store, apf=apf))
+    if cutoff is not None:
+        cutoff.record(node, value)
+    return value
+
+
+def _cut(frontier, store, cutoff):
+    """splits the frontier into the nodes held by the cutoff, whose previous
+    values get stored, and the ones that must be evaluated"""
+    held, run = [], []
+    for node in frontier:
+        if cutoff.holds(node, store):
+            store[node] = cutoff.previous(node)
+            held.append(node)
+        else:
+            run.append(node)
+    return held, run
+
+
+def _subscribed(value):
+    return value.subscribe() if isinstance(value, _Pipe) else value
+
+
+def _local(node, store):
+    """tells whether node streams, or consumes a stream, in which case it must
+    be evaluated by the building process"""
+    spec = u.node_spec(store[node])
+    return isinstance(spec.value, _Streaming) or any(
+        isinstance(store.get(arg), _Pipe) for arg in spec.args
     )
 
-    pool.close()
-    pool.join()
 
+def _split(frontier, store):
+    """splits the frontier into the nodes to hand to worker processes and the
+    ones to evaluate in the building process, which are all of them if there
+    is only one"""
+    if len(frontier) < 2:
+        return [], frontier
+    local = {node for node in frontier if _local(node, store)}
+    return (
+        [node for node in frontier if node not in local],
+        [node for node in frontier if node in local],
+    )
+
+
+def _bind_streams(store, artifacts, graph, solver):
+    """Replaces the streaming nodes of the store by nodes that start a pipe
+    with as many subscribers as they have dependents in the graph. Returns
+    the list the pipes get added to as they are started, or None if there is
+    no streaming node.
+
+    Only the threads solver evaluates the dependents of a stream at the same
+    time. The other solvers evaluate them in the building process, one after
+    the other, so a warning is issued for the streams with several of them,
+    whose chunks are then buffered for the dependents that have yet to start.
+    """
+    streams = [
+        node for node, value in artifacts.items() if isinstance(value, u.Stream)
+    ]
+    if not streams:
+        return None
+    pipes = []
+    for node in streams:
+        spec = u.node_spec(artifacts[node])
+        subscribers = len(set(graph[node]))
+        if subscribers > 1 and solver != "threads":
+            warnings.warn(
+                "the {} dependents of stream [{}] are evaluated one after the "
+                "other by the '{}' solver, so its chunks are buffered for the "
+                "ones that have yet to start reading: use the 'threads' solver "
+                "to keep them within maxsize".format(subscribers, node, solver),
+                RuntimeWarning,
+                stacklevel=2,
+            )
+        streaming = _Streaming(spec, artifacts[node].maxsize, subscribers, pipes)
+        store[node] = u.At(*spec.args, streaming) if spec.args else streaming
+    return pipes
+
+
+def _unpiped(stream, pipes):
+    """Runs the stream of a build with streaming nodes, leaving out their
+    pipes, which are neither yielded nor returned, and closes the pipes once
+    the build is over so that none of them is left waiting for a dependent."""
+    try:
+        while True:
+            try:
+                node, value = next(stream)
+            except StopIteration as stop:
+                result = stop.value
+                break
+            if not isinstance(value, _Pipe):
+                yield node, value
+    finally:
+        stream.close()
+        each(lambda pipe: pipe.close(), pipes)
+    return {
+        node: value for node, value in result.items() if not isinstance(value, _Pipe)
+    }
+
+
+class _Streaming:
+    """Function of a streaming node. Called with the values of its arguments,
+    it starts a pipe that hands the chunks of the node out to its subscribers
+    or, if the node has none, returns the list of its chunks."""
+
+    def __init__(self, spec, maxsize, subscribers, pipes):
+        self._spec = spec
+        self._maxsize = maxsize
+        self._subscribers = subscribers
+        self._pipes = pipes
+        self.__signature__ = u.positional_signature(len(spec.args))
+
+    def __call__(self, *args):
+        chunks = _apply(self._spec, *args)
+        if not self._subscribers:
+            return list(chunks)
+        pipe = _Pipe(chunks, self._subscribers, self._maxsize)
+        self._pipes.append(pipe)
+        return pipe
+
+
+class _Pipe:
+    """Pulls the chunks of a streaming node from a thread of its own, started
+    by the first subscriber to read, and hands each one to every subscriber as
+    it is produced. The node waits while a subscriber that is reading has
+    maxsize chunks left to read. Chunks are buffered for the subscribers that
+    have yet to start reading, so that dependents evaluated one after the
+    other do not wait on each other. Subscribers that stop reading are
+    skipped and the node is stopped as soon as none is left."""
+
+    def __init__(self, chunks, subscribers, maxsize):
+        self._maxsize = maxsize
+        self._changed = threading.Condition()
+        self._subscriptions = [
+            _Subscription(self._changed, self._start) for _ in range(subscribers)
+        ]
+        self._unclaimed = deque(self._subscriptions)
+        self._thread = threading.Thread(target=self._pump, args=(chunks,))
+        self._thread.daemon = True
+
+    def subscribe(self):
+        """returns the iterator over the chunks of the next subscriber"""
+        return self._unclaimed.popleft()
+
+    def _start(self):
+        if self._thread.ident is None:
+            self._thread.start()
+
+    def _pump(self, chunks):
+        end = _END
+        try:
+            for chunk in chunks:
+                if not self._hand(chunk):
+                    break
+        except Exception as error:  # pylint: disable=W0703
+            end = _Failure(error)
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+        self._hand(end)
+
+    def _hand(self, chunk):
+        """hands chunk to the open subscriptions, once there is room for it,
+        and tells whether there was any"""
+        with self._changed:
+            self._changed.wait_for(self._room)
+            subscriptions = [s for s in self._subscriptions if not s.closed]
+            each(lambda subscription: subscription.chunks.append(chunk), subscriptions)
+            self._changed.notify_all()
+            return bool(subscriptions)
+
+    def _room(self):
+        return all(
+            len(s.chunks) < self._maxsize
+            for s in self._subscriptions
+            if s.reading and not s.closed
+        )
+
+    def close(self):
+        """stops handing chunks out"""
+        each(lambda subscription: subscription.close(), self._subscriptions)
+
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+class _Subscription:
+    """iterator over the chunks of a pipe for one of its subscribers"""
+
+    def __init__(self, changed, start):
+        self._changed = changed
+        self._start = start
+        self._done = False
+        self.chunks = deque()
+        self.reading = False
+        self.closed = False
+
+    def close(self):
+        """stops receiving chunks, unblocking the pipe if it waits on this
+        subscriber"""
+        with self._changed:
+            self.closed = True
+            self.chunks.clear()
+            self._changed.notify_all()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+        with self._changed:
+            if not self.reading:
+                self.reading = True
+                self._start()
+            self._changed.wait_for(lambda: self.chunks or self.closed)
+            chunk = self.chunks.popleft() if self.chunks else _END
+            self._changed.notify_all()
+        if chunk is _END or isinstance(chunk, _Failure):
+            self._done = True
+            self.close()
+            if chunk is not _END:
+                raise chunk.error
+            raise StopIteration
+        return chunk
+
+    def __del__(self):
+        self.close()
+
+
+class _Cutoff:
+    """Early cutoff. Tracks the nodes whose values changed during a build so
+    that a node whose definition is unchanged and whose dependencies all kept
+    their values can keep its previous value instead of being evaluated.
+
+    Args:
+        previous (dict): node values of an earlier build.
+        changed (set, optional): nodes known to have changed since. Updated
+            in place.
+        equal (callable, optional): value comparison, artifax.utils.equal by
+            default.
+    """
+
+    def __init__(self, previous, changed=None, equal=None):
+        self._previous = previous
+        self._changed = changed if changed is not None else set()
+        self._equal = equal or u.equal
+        self._unchanged = set()
+
+    def holds(self, node, store):
+        """tells whether node can keep its previous value. A node that is not
+        in previous but whose definition and dependencies did not change is
+        evaluated again, to the value it had before."""
+        if node in self._changed or any(
+            arg in self._changed for arg in u.node_spec(store[node]).args
+        ):
+            return False
+        if node in self._previous:
+            return True
+        self._unchanged.add(node)
+        return False
+
+    def evaluates(self, node):
+        """tells whether node gets evaluated whatever the values of its
+        dependencies turn out to be"""
+        return node in self._changed or node not in self._previous
+
+    def previous(self, node):
+        """previous value of node"""
+        return self._previous[node]
+
+    def touch(self, node):
+        """marks node as changed without comparing its value"""
+        self._changed.add(node)
+
+    def record(self, node, value):
+        """marks node as changed unless value equals its previous value. The
+        chunks of streaming nodes are not compared: they always change."""
+        if isinstance(value, _Pipe):
+            self.touch(node)
+        elif node in self._previous:
+            if self._equal(self._previous[node], value):
+                self._changed.discard(node)
+            else:
+                self._changed.add(node)
+        elif node not in self._unchanged:
+            self._changed.add(node)
+
+
+class _Consumers:
+    """Counts the nodes that have yet to consume the value of every node so
+    that values can be dropped from the store as soon as they are no longer
+    needed, unless they must be kept.
+
+    Args:
+        store (dict): the store of the build.
+        artifacts (dict): the nodes to be evaluated.
+        keep (iterable): nodes whose values must not be dropped.
+    """
+
+    def __init__(self, store, artifacts, keep):
+        self._keep = set(keep)
+        self._args = {}
+        self._counts = {}
+        for node, value in artifacts.items():
+            args = [arg for arg in u.node_spec(value).args if arg in store]
+            self._args[node] = args = list(dict.fromkeys(args))
+            for arg in args:
+                self._counts[arg] = self._counts.get(arg, 0) + 1
+
+    def done(self, node, store):
+        """releases the dependencies of node, which has just been resolved,
+        dropping the values that no node needs anymore, including its own"""
+        for arg in self._args.pop(node, ()):
+            self._counts[arg] -= 1
+            if not self._counts[arg] and arg not in self._keep:
+                store.pop(arg, None)
+        if not self._counts.get(node) and node not in self._keep:
+            store.pop(node, None)
+
+    def kept(self, store):
+        """the values of the kept nodes"""
+        return {node: store[node] for node in self._keep if node in store}
+
+
+def _tracer(report, on_node_start, on_node_end):
+    """returns a tracer if any instrumentation is requested, None otherwise"""
+    if report is None and on_node_start is None and on_node_end is None:
+        return None
+    return _Tracer(report, on_node_start, on_node_end)
+
+
+class _Tracer:
+    """Fills the report of a build and calls its hooks.
+
+    Args:
+        report (artifax.BuildReport, optional): the report to fill.
+        on_node_start (callable, optional): called with each node as it is
+            handed to the solver.
+        on_node_end (callable, optional): called with each node and its record
+            as its value is received.
+    """
+
+    def __init__(self, report=None, on_node_start=None, on_node_end=None):
+        self.report = report if report is not None else BuildReport()
+        self._on_node_start = on_node_start
+        self._on_node_end = on_node_end
+        self._queued = {}
+        self.report.start = time.perf_counter()
+
+    def start(self, node):
+        """records that node was handed to the solver"""
+        self._queued[node] = time.perf_counter()
+        if self._on_node_start is not None:
+            self._on_node_start(node)
+
+    def end(self, node, value, stamp, size=None):
+        """records the evaluation of node, given the (start, end, cpu, worker)
+        stamp of its worker, and returns the time it took. The size of value
+        is estimated unless it is given."""
+        start, end, cpu, worker = stamp
+        queued = self._queued.pop(node, start)
+        if size is None:
+            size = u.sizeof(value)
+        record = NodeRecord(node, queued, start, end, cpu, worker, size)
+        self.report.records[node] = record
+        if self._on_node_end is not None:
+            self._on_node_end(node, record)
+        return end - start
 
-def _resolve(node, store, apf=False):
-    value = store[node]
-    keys = u.arglist(value)
-    if isinstance(value, u.At):
-        keys = value.args()
-        value = value.value()
-    args = [store[key] for key in keys if key in store]
-    unresolved = [key for key in keys if key not in store]
-    if not apf and unresolved:
-        raise UnresolvedDependencyError(nodes=unresolved)
-    return _apply(value, *args)
+    def finish(self):
+        """records the end of the build"""
+        self.report.end = time.perf_counter()
@@ -0,0 +1,421 @@
+""" cache.py
+
+This module hosts the DiskCache class, a persistent store of node results that
+survives process restarts, along with the functions that derive the content
+addresses under which results are stored.
+
+A node's address is a hash of its definition, that is, the bytecode, constants
+and closure of its function and the globals it refers to, combined with the
+addresses of its dependencies.
+Addresses can therefore be computed without evaluating anything and a node
+whose address is found in the cache needs neither to be evaluated nor to have
+its dependencies evaluated.
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+import sysconfig
+import tempfile
+import types
+from functools import partial
+
+from . import utils as u
+from .exceptions import CircularDependencyError
+
+__author__ = "Bruno Lange"
+__email__ = "blangeram@gmail.com"
+__license__ = "MIT"
+
+
+_SALT = "artifax-cache-2 python-{}.{}".format(*sys.version_info[:2]).encode()
+
+# classes defined in these directories are identified by their names only
+_INSTALLED = tuple(
+    {sysconfig.get_path(name) for name in ("stdlib", "platstdlib", "purelib", "platlib")}
+)
+
+
+def fingerprint(value):
+    """Returns a hex digest that identifies the given node value. Functions are
+    identified by their bytecode, constants, default arguments, the contents
+    of their closures and the values they refer to through globals, modules
+    aside. Classes are identified by their methods and attributes, unless
+    they come with Python or with an installed package, in which case their
+    names identify them. Sets are identified by their items whatever their
+    order and any other value is identified by its pickled representation.
+
+    Returns None if the value can not be fingerprinted, e.g. if it, or a
+    global it refers to, can not be pickled, in which case its node can not
+    be cached.
+    """
+    digest = hashlib.sha256(_SALT)
+    try:
+        _feed(digest, value, set())
+    except (pickle.PicklingError, TypeError, AttributeError, ValueError):
+        return None
+    return digest.hexdigest()
+
+
+def _feed(digest, value, seen):
+    if isinstance(value, types.FunctionType):
+        if id(value) in seen:
+            digest.update(b"<recursion>")
+            return
+        seen.add(id(value))
+        digest.update(b"<function>")
+        _feed(digest, value.__code__, seen)
+        _feed(digest, value.__defaults__, seen)
+        _feed(digest, value.__kwdefaults__, seen)
+        for cell in value.__closure__ or ():
+            try:
+                contents = cell.cell_contents
+            except ValueError:
+                digest.update(b"<empty>")
+                continue
+            _feed(digest, contents, seen)
+        for name in _global_names(value.__code__):
+            if name not in value.__globals__:
+                continue
+            referent = value.__globals__[name]
+            if not isinstance(referent, types.ModuleType):
+                digest.update(name.encode())
+                _feed(digest, referent, seen)
+    elif isinstance(value, types.CodeType):
+        digest.update(b"<code>")
+        digest.update(value.co_code)
+        digest.update(repr((value.co_names, value.co_varnames)).encode())
+        for const in value.co_consts:
+            _feed(digest, const, seen)
+    elif isinstance(value, types.MethodType):
+        digest.update(b"<method>")
+        _feed(digest, value.__func__, seen)
+        _feed(digest, value.__self__, seen)
+    elif isinstance(value, partial):
+        digest.update(b"<partial>")
+        _feed(digest, value.func, seen)
+        _feed(digest, value.args, seen)
+        _feed(digest, value.keywords, seen)
+    elif isinstance(value, u.At):
+        digest.update(b"<at>")
+        digest.update(repr(tuple(value.args())).encode())
+        _feed(digest, value.value(), seen)
+    elif isinstance(value, (staticmethod, classmethod)):
+        _feed(digest, value.__func__, seen)
+    elif isinstance(value, property):
+        digest.update(b"<property>")
+        _feed(digest, (value.fget, value.fset, value.fdel), seen)
+    elif isinstance(value, type) and not _installed(value):
+        digest.update("<class {}>".format(value.__qualname__).encode())
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        _feed(digest, value.__bases__, seen)
+        for name, attribute in sorted(vars(value).items()):
+            if isinstance(attribute, _SLOTS):
+                continue
+            digest.update(name.encode())
+            if isinstance(attribute, _METHODS):
+                _feed(digest, attribute, seen)
+                continue
+            # bookkeeping of abc, dataclasses and the like may not pickle
+            try:
+                digest.update(_digest(attribute, seen))
+            except (pickle.PicklingError, TypeError, AttributeError, ValueError):
+                digest.update(b"<opaque>")
+    elif isinstance(value, (tuple, list)):
+        digest.update("<{}:{}>".format(type(value).__name__, len(value)).encode())
+        for item in value:
+            _feed(digest, item, seen)
+    elif type(value) is dict:  # pylint: disable=C0123
+        digest.update("<dict:{}>".format(len(value)).encode())
+        for key, item in value.items():
+            _feed(digest, key, seen)
+            _feed(digest, item, seen)
+    elif type(value) in (set, frozenset):  # pylint: disable=C0123
+        # sets iterate, and pickle, in an order that depends on the hash seed
+        digest.update("<{}:{}>".format(type(value).__name__, len(value)).encode())
+        for item in sorted(_digest(item, seen) for item in value):
+            digest.update(item)
+    elif isinstance(value, (type, types.BuiltinFunctionType, types.ModuleType)):
+        digest.update(
+            "<{}.{}>".format(
+                getattr(value, "__module__", None),
+                getattr(value, "__qualname__", value.__name__),
+            ).encode()
+        )
+    else:
+        digest.update(pickle.dumps(value, protocol=4))
+
+
+def _digest(value, seen):
+    """returns the digest of value on its own"""
+    digest = hashlib.sha256()
+    _feed(digest, value, seen)
+    return digest.digest()
+
+
+# attributes that classes get for their instance dictionaries and slots
+_SLOTS = (types.GetSetDescriptorType, types.MemberDescriptorType)
+
+# class attributes that must be fingerprinted for their classes to be
+_METHODS = (types.FunctionType, staticmethod, classmethod, property, type)
+
+
+def _installed(cls):
+    if cls.__module__ == "__main__":
+        return False
+    path = getattr(sys.modules.get(cls.__module__), "__file__", None)
+    return path is None or os.path.abspath(path).startswith(_INSTALLED)
+
+
+def _global_names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.update(_global_names(const))
+    return sorted(names)
+
+
+def content_keys(definitions, nodes, keys=None):
+    """Computes the content address of the given nodes and of every node they
+    depend on, directly or not. Dependencies that are not defined take part
+    in the address through their names only.
+
+    Args:
+        definitions (dict): node values, as given to the build function.
+        nodes (iterable): nodes whose addresses are needed.
+        keys (dict, optional): known addresses. It is updated in place and
+            returned.
+
+    Throws artifax.CircularDependencyError
+    if graph is not a Direct Acyclic Graph (DAG)
+    """
+    keys = {} if keys is None else keys
+    visiting = set()
+    for root in nodes:
+        stack = [root]
+        while stack:
+            node = stack[-1]
+            if node in keys:
+                stack.pop()
+                continue
+            spec = u.node_spec(definitions[node])
+            missing = [
+                arg for arg in spec.args if arg in definitions and arg not in keys
+            ]
+            if missing:
+                if node in visiting:
+                    raise CircularDependencyError(
+                        "artifact graph is not a DAG", nodes=[node]
+                    )
+                visiting.add(node)
+                stack.extend(missing)
+                continue
+            stack.pop()
+            keys[node] = _address(definitions[node], spec, keys, definitions)
+    return keys
+
+
+def _address(value, spec, keys, definitions):
+    parts = [fingerprint(value)]
+    parts += [keys[arg] if arg in definitions else "?" + str(arg) for arg in spec.args]
+    if None in parts:
+        return None
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+class PickleSerializer:
+    """Stores any picklable value with the highest pickle protocol."""
+
+    suffix = ".pkl"
+
+    def accepts(self, value):  # pylint: disable=W0613,R0201
+        """tells whether the serializer can store the given value"""
+        return True
+
+    def dump(self, value, handle):  # pylint: disable=R0201
+        """writes value to the given binary file handle"""
+        pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, path):  # pylint: disable=R0201
+        """reads the value stored at path"""
+        with open(path, "rb") as handle:
+            return pickle.load(handle)
+
+
+class NumpySerializer:
+    """Stores NumPy arrays in the .npy format and loads them back as memory
+    mapped arrays, so only the pages that are actually read get loaded. Does
+    not accept anything if NumPy is not installed.
+
+    Args:
+        mmap_mode (str, optional): memory-map mode given to numpy.load.
+            Defaults to 'r'. Use None to load arrays entirely into memory.
+    """
+
+    suffix = ".npy"
+
+    def __init__(self, mmap_mode="r"):
+        self._mmap_mode = mmap_mode
+
+    def accepts(self, value):  # pylint: disable=R0201
+        """tells whether the serializer can store the given value"""
+        try:
+            import numpy  # pylint: disable=C0415
+        except ImportError:
+            return False
+        return isinstance(value, numpy.ndarray) and not value.dtype.hasobject
+
+    def dump(self, value, handle):  # pylint: disable=R0201
+        """writes value to the given binary file handle"""
+        import numpy  # pylint: disable=C0415
+
+        numpy.save(handle, value, allow_pickle=False)
+
+    def load(self, path):
+        """reads the value stored at path"""
+        import numpy  # pylint: disable=C0415
+
+        return numpy.load(path, mmap_mode=self._mmap_mode, allow_pickle=False)
+
+
+class DiskCache:
+    """A content-addressed store of node results in a local directory. Each
+    result is stored in its own file by the first serializer that accepts it.
+    When the directory grows beyond max_bytes, the least recently used
+    entries are evicted.
+
+    Args:
+        path (str): directory where results are stored. Created if needed.
+        max_bytes (int, optional): size limit of the cache. Unbounded by default.
+        serializers (list, optional): serializers to try, in order. Defaults
+            to a NumpySerializer followed by a PickleSerializer.
+    """
+
+    def __init__(self, path, max_bytes=None, serializers=None):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._serializers = (
+            serializers
+            if serializers is not None
+            else [NumpySerializer(), PickleSerializer()]
+        )
+        os.makedirs(path, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        """yields (path, size, last use) for every file in the cache"""
+        suffixes = tuple(serializer.suffix for serializer in self._serializers)
+        for entry in os.scandir(self._path):
+            if entry.is_file() and entry.name.endswith(suffixes):
+                stat = entry.stat()
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def _find(self, key):
+        for serializer in self._serializers:
+            path = os.path.join(self._path, key + serializer.suffix)
+            if os.path.exists(path):
+                return path, serializer
+        return None, None
+
+    def __contains__(self, key):
+        return self._find(key)[0] is not None
+
+    def get(self, key):
+        """Returns the value stored under key. Throws KeyError if there is none."""
+        path, serializer = self._find(key)
+        if path is None:
+            raise KeyError(key)
+        try:
+            os.utime(path)
+            return serializer.load(path)
+        except FileNotFoundError:
+            raise KeyError(key) from None
+
+    def put(self, key, value):
+        """Stores value under key. Returns False if none of the serializers
+        could store it."""
+        for serializer in self._serializers:
+            if serializer.accepts(value):
+                break
+        else:
+            return False
+
+        path = os.path.join(self._path, key + serializer.suffix)
+        handle = tempfile.NamedTemporaryFile(dir=self._path, delete=False)
+        try:
+            with handle:
+                serializer.dump(value, handle)
+            os.replace(handle.name, path)
+        except Exception:  # pylint: disable=W0703
+            os.unlink(handle.name)
+            return False
+
+        self._size += os.path.getsize(path)
+        if self._max_bytes is not None and self._size > self._max_bytes:
+            self._evict()
+        return True
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._size = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._size <= self._max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+    def clear(self):
+        """Removes every entry from the cache."""
+        for path, _, _ in list(self._entries()):
+            os.unlink(path)
+        self._size = 0
+
+    def lookup(self, definitions, pending, requested, keys=None):
+        """Splits the pending nodes that are needed to build the requested ones
+        into the ones found in the cache, which get loaded, and the ones that
+        must be evaluated. Walking back from the requested nodes, the
+        dependencies of a node found in the cache are not needed, so they are
+        neither loaded nor returned.
+
+        Args:
+            definitions (dict): node values of the whole graph.
+            pending (dict): nodes that are not up to date.
+            requested (iterable): pending nodes whose values are needed.
+            keys (dict, optional): known content addresses, updated in place.
+
+        Returns a tuple (hits, misses) of dictionaries mapping nodes to their
+        loaded values and to their definitions, respectively.
+        """
+        keys = content_keys(definitions, requested, keys)
+        hits, misses = {}, {}
+        stack = list(requested)
+        while stack:
+            node = stack.pop()
+            if node in hits or node in misses:
+                continue
+            if keys.get(node) is not None:
+                try:
+                    hits[node] = self.get(keys[node])
+                    continue
+                except KeyError:
+                    pass
+            misses[node] = pending[node]
+            stack.extend(
+                arg for arg in u.node_spec(pending[node]).args if arg in pending
+            )
+        return hits, misses
+
+    def save(self, results, nodes, keys):
+        """Stores the results of the given nodes that have a content address
+        and are not in the cache yet. Nodes missing from results, e.g. the
+        ones dropped by a memory-bounded build, are skipped."""
+        for node in nodes:
+            key = keys.get(node)
+            if key is not None and node in results and key not in self:
+                self.put(key, results[node])
@@ -11,6 +11,15 @@ class CircularDependencyError(Exception):
     that there is at least one closed loop in its graph representation which
     means we can not determine an evaluation order for the artifact nodes"""
 
+    def __init__(self, message=None, nodes=None):
+        super().__init__(message)
+        self.nodes = nodes
+
+    def __str__(self):
+        if not self.nodes:
+            return super().__str__()
+        return "Circular dependencies: {}".format(self.nodes)
+
 
 class UnresolvedDependencyError(Exception):
     """This exception is thrown when not all of a node's dependencies can be found
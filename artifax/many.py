@@ -0,0 +1,153 @@
+""" many.py
+
+This module hosts the build_many function, which builds many independent
+artifacts graphs in a single build.
+
+The graphs are merged into one, where every node is named after the index of
+its graph, so the solver schedules the nodes of all the graphs at once and a
+parallel solver starts a single pool for all of them. Nodes are guarded so
+that the failure of one graph does not stop the others.
+"""
+
+from . import builder
+from . import utils as u
+from .exceptions import CircularDependencyError, UnresolvedDependencyError
+
+__author__ = "Bruno Lange"
+__email__ = "blangeram@gmail.com"
+__license__ = "MIT"
+
+__all__ = ["build_many"]
+
+
+def build_many(
+    graphs, allow_partial_functions=False, solver="linear", resolved=None, **kwargs
+):
+    """Builds many independent artifacts graphs over one scheduler. Returns a
+    list with, for each graph in the order they are given, either the
+    dictionary that the build function would return for it or the exception
+    that its build raised.
+
+    The nodes of all the graphs are handed to the solver together, so the
+    ready nodes of different graphs are interleaved and the parallel solvers
+    run all of them on a single pool, the one given as 'pool' if any. Once a
+    node of a graph fails, the nodes of that graph that depend on it are not
+    evaluated, whereas the other graphs are built to completion.
+    Streaming nodes are not guarded: one that raises when it is called stops
+    the whole build.
+
+    Args:
+        graphs (iterable): the artifacts dictionaries to build.
+        allow_partial_functions, solver (optional): see the build function.
+        resolved (dict, optional): values known beforehand, made available
+            to the nodes of every graph.
+        keep (iterable, optional): names of the nodes whose values must be
+            returned for each graph, see the build function. The nodes that
+            no other node of their graph depends on are held until the end
+            of the build as well, since the failures of a graph reach them.
+        **kwargs: see the build function. The nodes are named (i, node) in
+            the durations, costs, report and instrumentation hooks, where i
+            is the index of their graph.
+
+    Throws InvalidSolverError if solver is not among the available options.
+    """
+    graphs = list(graphs)
+    resolved = dict(resolved) if resolved else {}
+    keep = kwargs.pop("keep", None)
+    keep = set(keep) if keep is not None else None
+    outcomes = [None] * len(graphs)
+    merged, held = {}, []
+    for index, artifacts in enumerate(graphs):
+        try:
+            merged.update(
+                _merged(index, artifacts, resolved, allow_partial_functions)
+            )
+        except (CircularDependencyError, UnresolvedDependencyError) as error:
+            outcomes[index] = error
+            continue
+        if keep is not None:
+            graph = u.to_graph(artifacts)
+            held += [
+                (index, node)
+                for node in artifacts
+                if node in keep or not graph[node]
+            ]
+
+    if keep is not None:
+        kwargs["keep"] = held + [node for node in resolved if node in keep]
+    result = builder.build(
+        merged, allow_partial_functions, solver, resolved=resolved, **kwargs
+    )
+    for index, artifacts in enumerate(graphs):
+        if outcomes[index] is not None:
+            continue
+        values = {
+            node: result[(index, node)]
+            for node in artifacts
+            if (index, node) in result
+        }
+        failures = [value for value in values.values() if isinstance(value, _Failed)]
+        if failures:
+            outcomes[index] = failures[0].error
+        elif keep is None:
+            outcomes[index] = {**resolved, **values}
+        else:
+            values = {**resolved, **values}
+            outcomes[index] = {node: values[node] for node in keep if node in values}
+    return outcomes
+
+
+def _merged(index, artifacts, resolved, apf):
+    """Returns the nodes of the given graph renamed after its index, with
+    their arguments renamed along and their functions guarded.
+
+    Throws artifax.CircularDependencyError
+    if graph is not a Direct Acyclic Graph (DAG)
+    Throws artifax.UnresolvedDependencyError
+    if a node depends on a missing node and apf is not set
+    """
+    u.topological_sort(u.to_graph(artifacts))
+    merged = {}
+    for node, value in artifacts.items():
+        spec = u.node_spec(value)
+        args = [arg for arg in spec.args if arg in artifacts or arg in resolved]
+        if not apf and len(args) < len(spec.args):
+            raise UnresolvedDependencyError(
+                nodes=[arg for arg in spec.args if arg not in args]
+            )
+        names = [(index, arg) if arg in artifacts else arg for arg in args]
+        if isinstance(value, u.Stream):
+            streaming = u.At(*names, spec.value) if names else spec.value
+            value = u.Stream(streaming, value.maxsize)
+        elif spec.is_callable:
+            guarded = _Guarded(spec, len(names))
+            value = u.At(*names, guarded) if names else guarded
+        merged[(index, node)] = value
+    return merged
+
+
+class _Guarded:
+    """Function of a node in a merged graph. It evaluates the node unless one
+    of its arguments failed, and returns the failure of the node, if any,
+    rather than raising it, so that only its own graph is stopped."""
+
+    def __init__(self, spec, arity):
+        self._spec = spec
+        self.__signature__ = u.positional_signature(arity)
+
+    def __call__(self, *args):
+        for arg in args:
+            if isinstance(arg, _Failed):
+                return arg
+        try:
+            return builder._apply(self._spec, *args)
+        except Exception as error:  # pylint: disable=W0703
+            return _Failed(error)
+
+
+class _Failed:
+    """value of a node whose evaluation raised, or of the nodes that depend
+    on it"""
+
+    def __init__(self, error):
+        self.error = error
@@ -4,12 +4,11 @@ This module hosts classes that provided the object-oriented support to building
 artifacts.
 """
 
-import operator
-from functools import reduce
+from contextlib import contextmanager
 
 from exos import each
 
-from . import builder
+from . import builder, plan, sweeps
 from . import utils as u
 
 __author__ = "Bruno Lange"
@@ -36,67 +35,242 @@ class Artifax:
             dic = {}
         dic.update(kwargs)
         self._artifacts = dic.copy()
-        self._graph = None
-        self._update_graph()
+        self._upstream = {}
+        self._downstream = {}
+        each(self._link, self._artifacts)
         self._result = {}
         self._stale = set(self._artifacts.keys())
+        self._ancestry = {}
+        self._progeny = {}
         self._allow_partial_functions = allow_partial_functions
+        self._pools = {}
+        self._durations = {}
+        self._cache = None
+        self._keys = {}
+        self._equal = u.equal
+        self._dirty = set(self._artifacts)
+        self._batches = 0
+        self._deferred = (set(), set(), set())
+        self._max_bytes = None
+        self._sizes = {}
+        self._bytes = 0
 
-    def _update_graph(self):
-        self._graph = u.to_graph(self._artifacts)
+    def _link(self, node):
+        """indexes the edges between node and the names in its argument list.
+
+        _upstream maps each node to its dependencies whereas _downstream maps
+        every referenced name, whether or not it is a node yet, to the nodes
+        that depend on it.
+        """
+        args = tuple(dict.fromkeys(u.arglist(self._artifacts[node])))
+        self._upstream[node] = args
+        for arg in args:
+            self._downstream.setdefault(arg, set()).add(node)
+
+    def _unlink(self, node):
+        for arg in self._upstream.pop(node, ()):
+            dependents = self._downstream[arg]
+            dependents.discard(node)
+            if not dependents:
+                del self._downstream[arg]
+
+    def _parents(self, node):
+        return {arg for arg in self._upstream[node] if arg in self._artifacts}
+
+    def _closure(self, node, neighbors):
+        reached = set()
+        stack = [node]
+        while stack:
+            for neighbor in neighbors(stack.pop()):
+                if neighbor not in reached and neighbor in self._artifacts:
+                    reached.add(neighbor)
+                    stack.append(neighbor)
+        return frozenset(reached)
+
+    def _invalidate(self, sources, targets):
+        """drops the memoized closures that change when edges are added or
+        removed between any of the sources and any of the targets. Within a
+        batch, the sources and targets are collected and dropped at once."""
+        if not (self._ancestry or self._progeny):
+            return
+        if self._batches:
+            self._deferred[1].update(sources)
+            self._deferred[2].update(targets)
+            return
+        for memo, changed in ((self._ancestry, targets), (self._progeny, sources)):
+            dropped = [
+                node
+                for node, closure in memo.items()
+                if node in changed or not closure.isdisjoint(changed)
+            ]
+            for node in dropped:
+                del memo[node]
+
+    def ancestors(self, node):
+        """Returns the set of nodes that the given node depends on, directly
+        or not. Closures are memoized until an edge that affects them changes."""
+        if node not in self._artifacts:
+            raise KeyError(node)
+        self._settle()
+        if node not in self._ancestry:
+            self._ancestry[node] = self._closure(node, self._upstream.__getitem__)
+        return self._ancestry[node]
+
+    def descendants(self, node):
+        """Returns the set of nodes that depend on the given node, directly
+        or not. Closures are memoized until an edge that affects them changes."""
+        if node not in self._artifacts:
+            raise KeyError(node)
+        self._settle()
+        if node not in self._progeny:
+            self._progeny[node] = self._closure(
+                node, lambda n: self._downstream.get(n, ())
+            )
+        return self._progeny[node]
 
     def set(self, *args, **kwargs):
         """Sets node value."""
         if kwargs:
-            for key, value in kwargs.items():
-                self.set(key, value)
+            self.update(kwargs)
             return
         node, value = args[0], args[1]
-        if node in self._artifacts:
-            self._revoke(node)
-        self._stale.add(node)
+        existing = node in self._artifacts
+        if existing:
+            parents = self._parents(node)
+            self._unlink(node)
+        self._dirty.add(node)
         self._artifacts[node] = value
-        self._update_graph()
+        self._link(node)
+        # nodes that referred to this name before it was defined are stale too
+        self._revoke(node)
+        if not existing:
+            self._invalidate(
+                self._parents(node) | {node},
+                self._downstream.get(node, set()) | {node},
+            )
+        elif parents != self._parents(node):
+            self._invalidate(parents ^ self._parents(node), {node})
+
+    def update(self, mapping=None, **kwargs):
+        """Sets the values of several nodes at once, from a mapping and/or
+        keyword arguments, within a single batch."""
+        with self.batch():
+            for node, value in dict(mapping or {}, **kwargs).items():
+                self.set(node, value)
 
-    def _revoke(self, node):
-        self._stale.add(node)
-        each(self._revoke, self._graph[node])
+    @contextmanager
+    def batch(self):
+        """Context manager that defers the bookkeeping of the mutations made
+        within it until it exits, when the stale nodes are marked in a single
+        walk of the graph and the memoized closures that the new edges affect
+        are dropped at once. Batches can be nested.
+
+        Querying the graph or building it within a batch settles the pending
+        mutations first.
+        """
+        self._batches += 1
+        try:
+            yield self
+        finally:
+            self._batches -= 1
+            if not self._batches:
+                self._settle()
+
+    def _settle(self):
+        """applies the invalidation and revocation deferred by batches"""
+        roots, sources, targets = self._deferred
+        if not (roots or sources or targets):
+            return
+        self._deferred = (set(), set(), set())
+        batches, self._batches = self._batches, 0
+        try:
+            self._invalidate(sources, targets)
+            self._revoke(*roots)
+        finally:
+            self._batches = batches
+
+    def _revoke(self, *nodes):
+        """marks the given nodes and their descendants as stale. Since the
+        descendants of a stale node are always stale themselves, the walk stops
+        at stale nodes unless the descendants of a node have already been
+        memoized. Within a batch, the nodes are collected and revoked at once.
+        """
+        if self._batches:
+            self._deferred[0].update(nodes)
+            return
+        stack = []
+        for node in nodes:
+            if node in self._progeny:
+                self._stale.add(node)
+                self._stale.update(self._progeny[node])
+                each(lambda n: self._keys.pop(n, None), self._progeny[node] | {node})
+            else:
+                stack.append(node)
+        while stack:
+            current = stack.pop()
+            # undefined names, whose dependents are revoked when they get
+            # defined, or popped within a batch, are not nodes
+            if current in self._artifacts:
+                self._stale.add(current)
+            self._keys.pop(current, None)
+            stack.extend(
+                dependent
+                for dependent in self._downstream.get(current, ())
+                if dependent not in self._stale and dependent in self._artifacts
+            )
 
     def pop(self, node):
         """Removes node from the artifacts."""
-        if node in self._stale:
-            self._stale.remove(node)
+        parents = self._parents(node)
+        children = set(self._downstream.get(node, ()))
+        self._stale.discard(node)
+        self._dirty.discard(node)
+        self._dirty.update(child for child in children if child != node)
         item = self._artifacts.pop(node)
-        self._update_graph()
+        self._unlink(node)
+        self._forget(node)
+        self._durations.pop(node, None)
+        self._keys.pop(node, None)
+        self._invalidate(parents | {node}, children | {node})
         return item
 
     def _shipment(self, targets=None):
-        nodes = (
-            self._stale
-            if targets is None
-            else set(
-                reduce(
-                    operator.iconcat,
-                    [self._dependencies(t) for t in targets] + [list(targets)],
-                    [],
-                )
-            )
-        )
-        return {k: self._artifacts[k] for k in nodes}
-
-    def _dependencies(self, node):
-        def _moonwalk(node, graph, dependencies):
-            for vertex, neighbors in graph.items():
-                if node in neighbors:
-                    dependencies.append(vertex)
-                    _moonwalk(vertex, graph, dependencies)
-
-        dependencies = []
-        _moonwalk(node, self._graph, dependencies)
-        return dependencies
+        """returns the stale nodes, and the up-to-date ones whose values are not
+        held in memory, that need to be evaluated in order to build the given
+        targets or the entire graph, along with the values held in memory of
+        the up-to-date nodes they depend on. Walking back from the targets,
+        the dependencies of a node held in memory are not needed. Up-to-date
+        nodes that are not held, such as the streams consumed by their
+        dependents, are evaluated again when a node of the build needs them."""
+        self._settle()
+        if targets is None:
+            # in the order of definition, so the build does not depend on how
+            # the stale set happens to iterate
+            stack = [node for node in self._artifacts if node in self._stale]
+        else:
+            stack = list(targets)
+        pending = {}
+        while stack:
+            node = stack.pop()
+            if node in pending or node in self._result and node not in self._stale:
+                continue
+            pending[node] = self._artifacts[node]
+            stack.extend(arg for arg in self._upstream[node] if arg in self)
+        resolved = {
+            arg: self._result[arg]
+            for node in pending
+            for arg in self._upstream[node]
+            if arg in self._artifacts and arg not in pending
+        }
+        return pending, resolved
 
     def build(
-        self, targets=None, allow_partial_functions=None, solver="linear", **kwargs
+        self,
+        targets=None,
+        allow_partial_functions=None,
+        solver="linear",
+        keep=None,
+        **kwargs
     ):
         """Builds artifacts. Returns either a dictionary of resolved nodes or a tuple
         where each item corresponds to one of the defined targets.
@@ -108,31 +282,304 @@ class Artifax:
             allow_partial_functions (bool, optional): Set to True if artifacts are
                 allowed to be resolved to partial functions. Defaults to False.
             solver (str, optional): Choose artifax solver strategy. Pick between
-                {'linear', 'bfs', 'bfs_parallel', 'async'}. Defaults to 'linear'.
+                {'linear', 'bfs', 'bfs_parallel', 'fork', 'async', 'threads',
+                'distributed'}. Defaults to 'linear'.
                 Throws InvalidSolverError if solver is not among the available options.
+            keep (iterable, optional): nodes to hold in memory, besides the
+                targets, once the build is done. When given, or when targets
+                are given and a memory budget is set, the other values are
+                dropped during the build as soon as no node needs them and are
+                evaluated again on demand.
             **kwargs: Arbitrary keyword arguments that are solver-specific.
+                Unless a pool is given, the 'bfs_parallel', 'async' and
+                'threads' solvers run on a pool owned by the instance and
+                reused across builds.
+                Use close() or a with statement to shut it down.
+                The report, on_node_start and on_node_end instrumentation
+                arguments of artifax.build are passed along as well.
+
+        The time each node takes to run is recorded and the parallel solvers
+        use it to start the nodes on the longest remaining paths first.
+
+        Stale nodes whose definitions did not change, and whose dependencies
+        kept their values, are not evaluated again. See the equality method.
+        """
+        return u.drain(
+            self._stream(
+                targets, allow_partial_functions, solver, keep, kwargs, fetch=False
+            )
+        )
+
+    def iter_build(
+        self,
+        targets=None,
+        allow_partial_functions=None,
+        solver="linear",
+        keep=None,
+        **kwargs
+    ):
+        """Generator counterpart of the build method, which takes the same
+        arguments. Yields a (node, value) pair for each node of the build as
+        soon as its value is known, see artifax.builder.iter_build. The values
+        of up to date nodes, which need no building, come first. Only the
+        targets are yielded when targets are given.
+
+        Closing the generator early cancels the outstanding work, shutting
+        down the pool of the instance if it was used. The nodes that were
+        done by then are recorded as built and the others remain stale.
+        """
+        targets_ = (targets,) if isinstance(targets, str) else targets
+        stream = self._stream(targets, allow_partial_functions, solver, keep, kwargs)
+        for node, value in stream:
+            if not targets_ or node in targets_:
+                yield node, value
+
+    def _stream(
+        self, targets, allow_partial_functions, solver, keep, kwargs, fetch=True
+    ):
+        """yields the (node, value) pairs of a build and returns its result.
+        Unless fetch is set, the values held by the workers of the distributed
+        solver are yielded as references and fetched once the build is done."""
+        targets, return_bare_result = self._targets(targets)
+
+        owned = self._pooled(solver, kwargs)
+        shipment, resolved, hits = self._lookup(targets)
+        changed = self._changed(hits)
+        fresh = [
+            node
+            for node in targets or list(self._result)
+            if node in self._result and node not in shipment and node not in hits
+        ]
+        stream = builder._iter_build(
+            shipment,
+            solver=solver,
+            resolved=resolved,
+            durations=self._durations,
+            costs=self._durations,
+            allow_partial_functions=self._partial_functions(allow_partial_functions),
+            **self._cutoff(changed),
+            **self._keep(targets, keep),
+            **kwargs
+        )
+        if fetch:
+            stream = builder._fetching(stream, kwargs.get("executor"))
+        done = {}
+        try:
+            for node in fresh:
+                yield node, self._result[node]
+            for node, value in hits.items():
+                done[node] = value
+                yield node, value
+            while True:
+                try:
+                    node, value = next(stream)
+                except StopIteration as stop:
+                    result = stop.value
+                    break
+                done[node] = value
+                yield node, value
+        except GeneratorExit:
+            stream.close()
+            if owned is not None:
+                self._shutdown(owned, terminate=True)
+            built = {node: shipment[node] for node in done if node in shipment}
+            self._deliver(built, hits, done, None, False, changed)
+            raise
+
+        return self._deliver(
+            shipment, hits, result, targets, return_bare_result, changed, done
+        )
+
+    async def abuild(
+        self, targets=None, allow_partial_functions=None, keep=None, **kwargs
+    ):
+        """Awaitable counterpart of the build method, see artifax.builder.abuild.
+        Coroutine nodes are awaited concurrently on the running event loop.
+
+        Args:
+            targets (:obj:`string or tuple`, optional): Defines specific targets
+                to be built. Either a tuple of node names or a string for single
+                targets.
+            allow_partial_functions (bool, optional): Set to True if artifacts are
+                allowed to be resolved to partial functions. Defaults to False.
+            keep (iterable, optional): nodes to hold in memory, see build.
+            **kwargs: 'concurrency', 'executor' and instrumentation keyword
+                arguments of abuild.
         """
+        targets, return_bare_result = self._targets(targets)
+        shipment, resolved, hits = self._lookup(targets)
+        changed = self._changed(hits)
+        result = await builder.abuild(
+            shipment,
+            resolved=resolved,
+            allow_partial_functions=self._partial_functions(allow_partial_functions),
+            **self._cutoff(changed),
+            **self._keep(targets, keep),
+            **kwargs
+        )
+        return self._deliver(
+            shipment, hits, result, targets, return_bare_result, changed
+        )
+
+    def sweep(
+        self,
+        over,
+        targets=None,
+        allow_partial_functions=None,
+        solver="linear",
+        **kwargs
+    ):
+        """Builds artifacts for every point of a parameter sweep, see
+        artifax.sweeps.sweep. Returns the list of what the build method would
+        return for each point, in the order of the points.
+
+        The nodes that do not depend on the swept inputs are built by the
+        instance, as with the build method, so they are held and reused by
+        the points and by later builds. The values of the other nodes are not
+        held by the instance.
+
+        Args:
+            over (dict): swept inputs, mapped to the sequences of values they
+                take, see artifax.sweeps.sweep.
+            targets, allow_partial_functions, solver, **kwargs: see build.
+        """
+        targets, return_bare_result = self._targets(targets)
+        size = sweeps._size(over)
+        nodes = {
+            node: value for node, value in self._artifacts.items() if node not in over
+        }
+        varying = sweeps._dependents(nodes, over)
+        if targets:
+            needed = set(targets).union(*map(self.ancestors, targets))
+            varying &= needed
+        else:
+            needed = set(nodes)
+        shared = [
+            node
+            for node in self._artifacts
+            if node in needed and node not in varying and node not in over
+        ]
+        if targets:
+            # only the shared nodes that the points need are built
+            used = {arg for node in varying for arg in self._upstream[node]}
+            shared = [node for node in shared if node in used or node in targets]
+        values = {}
+        if shared and size:
+            built = self.build(
+                tuple(shared), allow_partial_functions, solver, **kwargs
+            )
+            values = dict(zip(shared, built))
+        self._pooled(solver, kwargs)
+        points = sweeps.sweep(
+            {node: self._artifacts[node] for node in varying},
+            over,
+            self._partial_functions(allow_partial_functions),
+            solver,
+            resolved=values,
+            **kwargs
+        )
+        if not targets:
+            names = list(self._artifacts) + [n for n in over if n not in self]
+            return [{node: point[node] for node in names} for point in points]
+        if return_bare_result:
+            return [point[targets[0]] for point in points]
+        return [tuple(point[target] for target in targets) for point in points]
+
+    def _lookup(self, targets):
+        """returns the shipment of the build along with the values it depends
+        on and, if a cache is set, the nodes that could be loaded from it.
+        Only the stale nodes that can not be loaded, and that are needed by
+        the targets, are shipped."""
+        shipment, resolved = self._shipment(targets)
+        if self._cache is None:
+            return shipment, resolved, {}
+        hits, misses = self._cache.lookup(
+            self._artifacts,
+            shipment,
+            shipment if targets is None else [t for t in targets if t in shipment],
+            self._keys,
+        )
+        # nodes that are no longer needed because a node that depends on them
+        # was found in the cache become up to date, albeit not held in memory
+        unneeded = [
+            node for node in shipment if node not in hits and node not in misses
+        ]
+        self._stale.difference_update(unneeded)
+        each(self._forget, unneeded)
+        resolved.update(hits)
+        return misses, resolved, hits
+
+    def _targets(self, targets):
+        """normalizes the targets argument of the build methods into a tuple and
+        tells whether a bare result should be returned"""
         return_bare_result = isinstance(targets, str)
         targets = (targets,) if isinstance(targets, str) else targets
         if targets:
             for target in targets:
                 if target not in self:
                     raise KeyError(target)
+        return targets, return_bare_result
 
-        shipment = self._shipment(targets)
-        result = builder.build(
-            shipment,
-            solver=solver,
-            allow_partial_functions=(
-                allow_partial_functions
-                if allow_partial_functions is not None
-                else self._allow_partial_functions
-            ),
-            **kwargs
+    def _partial_functions(self, allow_partial_functions):
+        return (
+            allow_partial_functions
+            if allow_partial_functions is not None
+            else self._allow_partial_functions
         )
 
-        self._stale = {k for k in self._stale if k not in shipment}
+    def _changed(self, hits):
+        """nodes that can not keep their previous values: the ones whose
+        definitions changed, or whose dependencies changed value, since they
+        were last built, along with the cache hits that differ from the values
+        held in memory"""
+        changed = set(self._dirty)
+        if self._equal is not None:
+            changed.update(
+                node
+                for node, value in hits.items()
+                if node not in self._result
+                or not self._equal(self._result[node], value)
+            )
+        return changed
+
+    def _cutoff(self, changed):
+        """early cutoff arguments of the builder"""
+        if self._equal is None:
+            return {}
+        return {"previous": self._result, "changed": changed, "equal": self._equal}
+
+    def _keep(self, targets, keep):
+        """memory-bounded build arguments of the builder"""
+        if keep is None and (self._max_bytes is None or targets is None):
+            return {}
+        return {"keep": set(keep or ()).union(targets or ())}
+
+    def _deliver(
+        self, shipment, hits, result, targets, return_bare_result, changed, done=()
+    ):
+        if self._cache is not None:
+            self._cache.save(result, shipment, self._keys)
+        built = shipment.keys() | hits.keys()
+        for nodes in (shipment, hits):
+            self._stale.difference_update(nodes)
+        # values dropped during the build, and streams consumed by their
+        # dependents, are up to date but not held in memory
+        each(self._forget, built - result.keys())
+        self._dirty -= built
+        updated = built & changed if self._equal is not None else built
+        # dependents left out of the build were computed from the old values
+        for node in updated:
+            self._dirty.update(
+                child
+                for child in self._downstream.get(node, ())
+                if child in self._artifacts and child not in built
+            )
         self._result.update(result)
+        # the values the build read are used first, then the ones it built in
+        # the order they were done
+        touched = [node for node in result if node in self and node not in done]
+        touched += [node for node in done if node in result and node in self]
+        self._trim(touched, targets or ())
 
         if targets is None:
             return self._result
@@ -140,14 +587,146 @@ class Artifax:
         payload = tuple(self._result[target] for target in targets)
         return payload[0] if return_bare_result else payload
 
+    def _forget(self, node):
+        """drops the value of node held in memory"""
+        self._result.pop(node, None)
+        self._bytes -= self._sizes.pop(node, 0)
+
+    def _trim(self, touched, targets):
+        """records the sizes of the touched values as the most recently used
+        and evicts the least recently used values, other than the targets,
+        until the memory budget is met"""
+        if self._max_bytes is None:
+            return
+        for node in list(touched) + list(targets):
+            self._bytes -= self._sizes.pop(node, 0)
+            self._sizes[node] = u.sizeof(self._result[node])
+            self._bytes += self._sizes[node]
+        for node in list(self._sizes):
+            if self._bytes <= self._max_bytes:
+                break
+            if node not in targets:
+                self._forget(node)
+
+    def cache(self, *args):
+        """Fluent accessor of the persistent cache of the instance. Called with
+        an artifax.cache.DiskCache, or None to disable caching, it sets the
+        cache and returns the instance. Called with no arguments, it returns
+        the current cache.
+
+        Stale nodes found in the cache are loaded instead of evaluated, and
+        only when needed: a cached target does not require its dependencies
+        to be either loaded or evaluated.
+        """
+        return _fluent(self, "_cache", *args)
+
+    def max_bytes(self, *args):
+        """Fluent accessor of the memory budget, in bytes, of the values held
+        by the instance, as estimated by artifax.utils.sizeof. Called with a
+        number, or None to lift the budget, it sets the budget and returns the
+        instance. Called with no arguments, it returns the current budget.
+
+        Once a build is done, the least recently built or requested values are
+        dropped until the budget is met. The targets of the build are never
+        dropped, so the dictionary returned by a full build only holds the
+        values that fit. Dropped values are evaluated again when needed.
+        Targeted builds also drop the values that no other node needs during
+        the build itself, see the keep argument of build.
+        """
+        if not args:
+            return self._max_bytes
+        self._max_bytes = args[0]
+        self._sizes, self._bytes = {}, 0
+        self._trim(list(self._result), ())
+        return self
+
+    def equality(self, *args):
+        """Fluent accessor of the function that tells whether a node kept its
+        value when it was evaluated again, artifax.utils.equal by default.
+
+        When a node keeps its value, the stale nodes that depend on it need not
+        be evaluated again either and keep theirs. Called with None, every
+        stale node is evaluated.
+        """
+        return _fluent(self, "_equal", *args)
+
+    def _pooled(self, solver, kwargs):
+        """hands the pool owned by this instance to the solvers that run on one,
+        unless a pool is given, and returns the factory of that pool"""
+        if "pool" in kwargs:
+            return None
+        if solver in ("bfs_parallel", "async"):
+            owned, size = builder.process_pool, kwargs.pop("processes", None)
+        elif solver == "threads":
+            owned, size = builder.thread_pool, kwargs.pop("max_workers", None)
+        else:
+            return None
+        kwargs["pool"] = self._worker_pool(owned, size)
+        return owned
+
+    def _worker_pool(self, factory, size=None):
+        """returns the pool created by factory that is owned by this instance,
+        starting it if needed. The pool is restarted only if a different size
+        is requested."""
+        pool, current = self._pools.get(factory, (None, None))
+        if pool is not None and size not in (None, current):
+            self._shutdown(factory)
+            pool = None
+        if pool is None:
+            pool = factory(size)
+            self._pools[factory] = (pool, size)
+        return pool
+
+    def _shutdown(self, factory, terminate=False):
+        """shuts down the pool created by factory, terminating its processes
+        if terminate is set. Threads can not be terminated, so a thread pool
+        is then closed and left to finish its running nodes on its own."""
+        pool, _ = self._pools.pop(factory)
+        if terminate and factory is builder.thread_pool:
+            pool.close()
+            return
+        if terminate:
+            pool.terminate()
+        else:
+            pool.close()
+        pool.join()
+
+    def close(self):
+        """Shuts down the worker pools the instance keeps for its parallel
+        builds, if any. New pools are started by the next parallel build."""
+        each(self._shutdown, list(self._pools))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def compile(self, allow_partial_functions=None):
+        """Compiles the artifacts into a Plan. See artifax.plan.compile.
+
+        Args:
+            allow_partial_functions (bool, optional): Set to True if artifacts are
+                allowed to be resolved to partial functions. Defaults to the value
+                given to the constructor.
+        """
+        return plan.compile(
+            self._artifacts,
+            allow_partial_functions=self._partial_functions(allow_partial_functions),
+        )
+
     def initial(self):
         """Returns the initial objects of the artifacts graph, that is,
         the nodes that have no incoming edges, no dependencies."""
-        return u.initial(self._graph)
+        return {
+            node
+            for node, args in self._upstream.items()
+            if not any(arg in self._artifacts for arg in args)
+        }
 
     def number_of_edges(self):
         """Returns the number of edges in the artifacts graph."""
-        return sum(len(v) for v in self._graph.values())
+        return sum(len(self._downstream.get(node, ())) for node in self._artifacts)
 
     def number_of_nodes(self):
         """Returns the number of nodes in the artifacts graph."""
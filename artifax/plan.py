@@ -0,0 +1,103 @@
+""" plan.py
+
+This module hosts the Plan class, a compiled representation of an artifacts
+graph that can be executed over and over again, and the compile function that
+creates it.
+"""
+
+from functools import partial
+
+from . import utils as u
+from .exceptions import UnresolvedDependencyError
+
+__author__ = "Bruno Lange"
+__email__ = "blangeram@gmail.com"
+__license__ = "MIT"
+
+__all__ = ["Plan", "compile"]
+
+
+class Plan:
+    """A Plan is an artifacts graph that has been sorted and introspected
+    once and for all. Each node is assigned an integer slot and the plan keeps
+    the sequence of nodes to be evaluated along with the slots of their
+    arguments, so running it involves no graph traversal nor name lookups.
+
+    Plans are immutable. Use the run method to evaluate the graph, optionally
+    replacing the value of any node with a new constant.
+    """
+
+    __slots__ = ("_nodes", "_slots", "_values", "_steps", "_computed")
+
+    def __init__(self, artifacts, allow_partial_functions=False):
+        self._nodes = tuple(artifacts)
+        self._slots = {node: slot for slot, node in enumerate(self._nodes)}
+        values = [None] * len(self._nodes)
+        steps = []
+        for node in u.topological_sort(u.to_graph(artifacts)):
+            slot = self._slots[node]
+            spec = u.node_spec(artifacts[node])
+            unresolved = [key for key in spec.args if key not in self._slots]
+            if not allow_partial_functions and unresolved:
+                raise UnresolvedDependencyError(nodes=unresolved)
+            if not spec.is_callable:
+                values[slot] = spec.value
+                continue
+            args = tuple(self._slots[key] for key in spec.args if key in self._slots)
+            steps.append((slot, spec.value, args, spec.arity == len(args)))
+
+        self._values = tuple(values)
+        self._steps = tuple(steps)
+        self._computed = frozenset(step[0] for step in steps)
+
+    def run(self, inputs=None, **kwargs):
+        """Evaluates the plan and returns a dictionary where each node is
+        mapped to its final value.
+
+        Args:
+            inputs (dict, optional): new values for any of the plan's nodes.
+                These are taken as constants, that is, they are never called.
+            **kwargs: same as inputs, for nodes whose names are valid
+                identifiers.
+
+        Throws KeyError if any of the inputs is not a node of the plan.
+        """
+        values = list(self._values)
+        steps = self._steps
+        if inputs or kwargs:
+            inputs = dict(inputs or {}, **kwargs)
+            slots = {self._slots[node] for node in inputs}
+            for node, value in inputs.items():
+                values[self._slots[node]] = value
+            if not slots.isdisjoint(self._computed):
+                steps = [step for step in steps if step[0] not in slots]
+
+        for slot, value, args, complete in steps:
+            params = [values[arg] for arg in args]
+            values[slot] = value(*params) if complete else partial(value, *params)
+
+        return dict(zip(self._nodes, values))
+
+    def nodes(self):
+        """Returns the nodes of the plan in slot order."""
+        return self._nodes
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, node):
+        return node in self._slots
+
+
+def compile(artifacts, allow_partial_functions=False):  # pylint: disable=W0622
+    """Compiles the given artifacts into a Plan that can be run repeatedly
+    with different inputs at a fraction of the cost of calling build.
+
+    Args:
+        allow_partial_functions (bool, optional): Set to True if artifacts are
+            allowed to be resolved to partial functions. Defaults to False.
+
+    Throws CircularDependencyError or UnresolvedDependencyError if the
+    artifacts can not be built.
+    """
+    return Plan(artifacts, allow_partial_functions=allow_partial_functions)
@@ -0,0 +1,338 @@
+""" remote.py
+
+This module hosts a reference implementation of the Executor interface over
+TCP sockets. A WorkerServer evaluates the nodes of the builds that run on it
+and holds on to their values, while a RemoteExecutor spreads the nodes of a
+build over a set of worker servers, on a single host or on many:
+
+    $ python -m artifax.remote --host 0.0.0.0 --port 8765
+
+    with RemoteExecutor([("host1", 8765), ("host2", 8765)]) as executor:
+        results = artifax.build(artifacts, solver="distributed", executor=executor)
+
+Functions are shipped once to each worker that needs them and the values of
+nodes stay on the worker that evaluated them. A worker that needs a value held
+by another one fetches it straight from its peer. Values are sent back to the
+building process only if they are returned, once the build is done, or as
+iter_build yields them.
+
+Messages are dill pickles, which can run arbitrary code when loaded, so worker
+servers must only be reachable by trusted clients.
+"""
+
+import argparse
+import secrets
+import socket
+import socketserver
+import struct
+import threading
+from itertools import count
+from queue import Queue
+
+import dill
+from exos import each
+
+from . import utils as u
+from .builder import Executor, Resident, _traced
+
+__author__ = "Bruno Lange"
+__email__ = "blangeram@gmail.com"
+__license__ = "MIT"
+
+
+# sizes of the (ident, failed) envelope and of the payload of a message
+_HEADER = struct.Struct("!QQ")
+
+
+def _send(sock, ident, failed, payload):
+    try:
+        blob = dill.dumps(payload)
+    except Exception:  # pylint: disable=W0703
+        if not failed:
+            raise
+        blob = dill.dumps(RuntimeError(repr(payload)))
+    envelope = dill.dumps((ident, failed))
+    sock.sendall(_HEADER.pack(len(envelope), len(blob)) + envelope)
+    sock.sendall(blob)
+
+
+def _recv(sock):
+    """reads a message from the socket and returns its ident, whether it
+    carries an exception and its payload, which is left for the caller to load
+    so that messages that can not be loaded can still be replied to"""
+    sizes = _HEADER.unpack(_read(sock, _HEADER.size))
+    ident, failed = dill.loads(_read(sock, sizes[0]))
+    return ident, failed, _read(sock, sizes[1])
+
+
+def _read(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        chunk = sock.recv_into(view[received:])
+        if not chunk:
+            raise EOFError("connection closed")
+        received += chunk
+    return buffer
+
+
+class _Connection:
+    """Client end of a connection to a worker server. Requests are sent in
+    order and handled by the worker in the same order. Replies are read by a
+    background thread and handed to the callbacks of their requests.
+    """
+
+    def __init__(self, address):
+        self._socket = socket.create_connection(address)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._lock = threading.Lock()
+        self._idents = count()
+        self._callbacks = {}
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def request(self, kind, payload, callback=None):
+        """sends a request; callback, if given, is called with the value of
+        the reply and None, or with None and the exception it carries"""
+        with self._lock:
+            ident = next(self._idents)
+            self._callbacks[ident] = callback
+            _send(self._socket, ident, False, (kind, payload))
+
+    def call(self, kind, payload):
+        """sends a request and returns the value of its reply"""
+        replies = Queue()
+        self.request(kind, payload, lambda value, error: replies.put((value, error)))
+        value, error = replies.get()
+        if error is not None:
+            raise error
+        return value
+
+    def _read(self):
+        try:
+            while True:
+                ident, failed, blob = _recv(self._socket)
+                try:
+                    value, error = dill.loads(blob), None
+                except Exception as exception:  # pylint: disable=W0703
+                    value, error = None, exception
+                if failed:
+                    value, error = None, value
+                callback = self._callbacks.pop(ident)
+                if callback is not None:
+                    callback(value, error)
+        except (EOFError, OSError):
+            pass
+        callbacks, self._callbacks = self._callbacks, {}
+        for callback in filter(None, callbacks.values()):
+            callback(None, ConnectionError("connection to worker lost"))
+
+    def close(self):
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+        self._reader.join()
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    """Worker that evaluates nodes for the RemoteExecutor instances connected
+    to it, one node at a time per executor, and holds on to their values until
+    they are dropped. Call serve_forever to start serving, typically from a
+    thread or a process of its own, and shutdown to stop.
+
+    Args:
+        host (str, optional): interface to listen on. Defaults to localhost.
+        port (int, optional): port to listen on. A free one is picked by
+            default, see the address attribute.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), _Handler)
+        self.functions = {}
+        self.values = {}
+        self.defined = 0
+        self.received = 0
+
+    @property
+    def address(self):
+        """the (host, port) the server listens on"""
+        return self.server_address[:2]
+
+    def define(self, token, key, blob):
+        """stores the function of an executor under key, or the exception
+        raised when loading it, to be raised when it is called for"""
+        try:
+            self.functions[token, key] = dill.loads(blob)
+        except Exception as error:  # pylint: disable=W0703
+            self.functions[token, key] = _Broken(error)
+        self.defined += 1
+
+    def run(self, peers, token, node, spec, args):
+        """evaluates a node, fetching the values held by other workers, and
+        returns its (start, end, cpu, worker) stamp and the size of its value"""
+        if spec.is_callable:
+            function = self.functions[token, spec.value]
+            if isinstance(function, _Broken):
+                raise function.error
+            spec = spec._replace(value=function)
+        args = [
+            self._resolve(peers, token, arg) if isinstance(arg, Resident) else arg
+            for arg in args
+        ]
+        value, stamp = _traced(spec, *args)
+        self.values[token, node] = value
+        return stamp, u.sizeof(value)
+
+    def _resolve(self, peers, token, resident):
+        if (token, resident.node) in self.values:
+            return self.values[token, resident.node]
+        if resident.worker not in peers:
+            peers[resident.worker] = _Connection(resident.worker)
+        value = peers[resident.worker].call("fetch", (token, resident.node))
+        self.received += 1
+        return value
+
+    def fetch(self, token, node):
+        return self.values[token, node]
+
+    def drop(self, token, nodes):
+        each(lambda node: self.values.pop((token, node), None), nodes)
+
+    def release(self, token):
+        """forgets every function and value of an executor"""
+        for store in (self.functions, self.values):
+            each(store.pop, [key for key in list(store) if key[0] == token])
+
+
+class _Broken:
+    def __init__(self, error):
+        self.error = error
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """serves the requests of a connection, in order"""
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        peers = {}
+        try:
+            while True:
+                ident, _, blob = _recv(self.request)
+                try:
+                    reply = self._serve(peers, *dill.loads(blob))
+                    _send(self.request, ident, False, reply)
+                except (EOFError, OSError):
+                    raise
+                except Exception as error:  # pylint: disable=W0703
+                    _send(self.request, ident, True, error)
+        except (EOFError, OSError):
+            pass
+        finally:
+            each(lambda peer: peer.close(), peers.values())
+
+    def _serve(self, peers, kind, payload):
+        server = self.server
+        if kind == "run":
+            return server.run(peers, *payload)
+        requests = {
+            "define": server.define,
+            "fetch": server.fetch,
+            "drop": server.drop,
+            "release": server.release,
+        }
+        return requests[kind](*payload)
+
+
+class RemoteExecutor(Executor):
+    """Executor whose workers are WorkerServer instances, identified by their
+    (host, port) addresses. Connections are opened as they are first needed
+    and close releases everything the executor left on its workers.
+
+    Args:
+        addresses (iterable): the (host, port) addresses of the workers.
+    """
+
+    def __init__(self, addresses):
+        self._addresses = [tuple(address) for address in addresses]
+        self._token = secrets.token_hex(8)
+        self._connections = {}
+        self._defined = {}
+
+    def workers(self):
+        return list(self._addresses)
+
+    def submit(self, worker, node, spec, args, callback):
+        connection = self._connection(worker)
+        if spec.is_callable:
+            defined = self._defined.setdefault(worker, {})
+            key = id(spec.value)
+            if key not in defined:
+                # functions are kept alive so that their ids are not reused
+                defined[key] = spec.value
+                connection.request("define", (self._token, key, dill.dumps(spec.value)))
+            spec = spec._replace(value=key)
+
+        def _reply(value, error):
+            if error is not None:
+                callback(node, None, None, error)
+            else:
+                callback(node, *value, None)
+
+        connection.request("run", (self._token, node, spec, args), _reply)
+
+    def fetch(self, worker, node):
+        return self._connection(worker).call("fetch", (self._token, node))
+
+    def drop(self, worker, nodes):
+        self._connection(worker).request("drop", (self._token, list(nodes)))
+
+    def _connection(self, worker):
+        if worker not in self._connections:
+            self._connections[worker] = _Connection(worker)
+        return self._connections[worker]
+
+    def close(self):
+        """releases the functions and values left on the workers and closes
+        the connections to them"""
+        connections, self._connections = self._connections, {}
+        self._defined = {}
+        for connection in connections.values():
+            try:
+                connection.call("release", (self._token,))
+            except (ConnectionError, OSError):
+                pass
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m artifax.remote",
+        description="Serves an artifax worker for the distributed solver.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+    server = WorkerServer(args.host, args.port)
+    print("serving artifax worker on {}:{}".format(*server.address), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
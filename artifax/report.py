@@ -0,0 +1,111 @@
+""" report.py
+
+This module hosts the BuildReport class, which collects the timings of the
+nodes evaluated by a build, and the NodeRecord tuple that describes each one
+of them.
+
+Timestamps are taken from time.perf_counter, a monotonic clock that is shared
+by all the processes of a machine, so the records of nodes evaluated by worker
+processes can be laid out on the same timeline as the build itself.
+"""
+
+import json
+from collections import namedtuple
+
+__author__ = "Bruno Lange"
+__email__ = "blangeram@gmail.com"
+__license__ = "MIT"
+
+
+class NodeRecord(
+    namedtuple(
+        "NodeRecord", ["node", "queued", "start", "end", "cpu", "worker", "size"]
+    )
+):
+    """Describes the evaluation of a node: when it was handed to the solver,
+    when it started and ended running, the CPU time it took, the (process id,
+    thread id) pair of the worker that ran it and the estimated size, in
+    bytes, of its value. The CPU time of nodes that are awaited on an event
+    loop is None since they share their thread with other nodes.
+    """
+
+    __slots__ = ()
+
+    @property
+    def wall(self):
+        """time, in seconds, the node took to run"""
+        return self.end - self.start
+
+    @property
+    def wait(self):
+        """time, in seconds, the node waited for a worker"""
+        return self.start - self.queued
+
+
+class BuildReport:
+    """Collects a NodeRecord for each node evaluated by a build. Pass one to
+    the report argument of artifax.build, or of the build methods of Artifax
+    instances, and it gets filled in place.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.start = None
+        self.end = None
+
+    @property
+    def wall(self):
+        """time, in seconds, the build took"""
+        return self.end - self.start
+
+    @property
+    def busy(self):
+        """time, in seconds, spent evaluating nodes, summed over all workers.
+        In a serial build, the difference to wall is scheduling overhead."""
+        return sum(record.wall for record in self.records.values())
+
+    def workers(self):
+        """returns the set of workers that evaluated nodes"""
+        return {record.worker for record in self.records.values()}
+
+    def slowest(self, count=10):
+        """returns the records of the nodes that took longest to run"""
+        records = sorted(self.records.values(), key=lambda r: r.wall, reverse=True)
+        return records[:count]
+
+    def to_chrome_trace(self):
+        """Returns the report in the Chrome trace event format, as a dictionary.
+        Each worker is laid out as a thread of its process. Load the JSON dump
+        of the dictionary in chrome://tracing or https://ui.perfetto.dev.
+        """
+        origin = self.start
+        if origin is None:
+            origin = min((r.queued for r in self.records.values()), default=0)
+        events = []
+        for record in self.records.values():
+            pid, tid = record.worker
+            events.append(
+                {
+                    "name": str(record.node),
+                    "cat": "node",
+                    "ph": "X",
+                    "ts": (record.start - origin) * 1e6,
+                    "dur": record.wall * 1e6,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {
+                        "cpu": record.cpu,
+                        "wait": record.wait,
+                        "size": record.size,
+                    },
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, path):
+        """Writes the report to path in the Chrome trace event format."""
+        with open(path, "w") as handle:
+            json.dump(self.to_chrome_trace(), handle)
+
+    def __len__(self):
+        return len(self.records)
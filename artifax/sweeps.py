@@ -0,0 +1,187 @@
+""" sweeps.py
+
+This module hosts the sweep function, which evaluates an artifacts graph for
+many values of some of its inputs in a single build.
+
+The graph of a sweep holds a copy of each node that depends on the swept
+inputs for every point of the sweep, whereas the nodes that do not depend on
+them are shared by all the points and thus evaluated once. Vectorized nodes
+that depend on the swept inputs are evaluated once for all the points, with
+the values of the points stacked into arrays.
+"""
+
+from . import builder
+from . import utils as u
+
+__author__ = "Bruno Lange"
+__email__ = "blangeram@gmail.com"
+__license__ = "MIT"
+
+__all__ = ["sweep"]
+
+
+def sweep(
+    artifacts,
+    over,
+    allow_partial_functions=False,
+    solver="linear",
+    resolved=None,
+    **kwargs
+):
+    """Builds artifacts for every point of a parameter sweep. Returns the list
+    of the dictionaries that the build function would return for each point,
+    in the order of the points.
+
+    Nodes that do not depend on the swept inputs, directly or not, are
+    evaluated once and their values are shared by all the points. The other
+    nodes are evaluated once per point, unless they are Vectorized, in which
+    case they are evaluated once for all the points. The copies of a node for
+    different points do not depend on each other, so the parallel solvers
+    evaluate them concurrently.
+
+    Args:
+        artifacts (dict): the nodes to build.
+        over (dict): swept inputs, mapped to the sequences of values they
+            take. Inputs are either nodes of artifacts, whose definitions are
+            replaced by the swept values, or names that nodes refer to.
+            Inputs are swept together: the i-th point of the sweep gives each
+            of them its i-th value.
+        allow_partial_functions, solver, resolved, **kwargs: see the build
+            function.
+
+    Throws ValueError if the swept inputs do not all have as many values.
+    """
+    size = _size(over)
+    if not size:
+        return []
+    nodes = {node: value for node, value in artifacts.items() if node not in over}
+    varying = _dependents(nodes, over)
+
+    expanded = {node: value for node, value in nodes.items() if node not in varying}
+    for node in varying:
+        expanded.update(_expand(node, nodes, varying, over, size))
+    store = dict(resolved) if resolved else {}
+    store.update(
+        {(name, i): values[i] for name, values in over.items() for i in range(size)}
+    )
+    result = builder.build(
+        expanded, allow_partial_functions, solver, resolved=store, **kwargs
+    )
+
+    names = list(dict.fromkeys(list(resolved or ()) + list(artifacts) + list(over)))
+    return [
+        {
+            node: result[(node, i)] if node in over or node in varying else result[node]
+            for node in names
+        }
+        for i in range(size)
+    ]
+
+
+def _dependents(artifacts, inputs):
+    """returns the nodes of artifacts that depend on any of the given inputs,
+    directly or not
+
+    Throws artifax.CircularDependencyError
+    if graph is not a Direct Acyclic Graph (DAG)
+    """
+    found = set()
+    for node in u.topological_sort(u.to_graph(artifacts)):
+        if any(arg in inputs or arg in found for arg in u.arglist(artifacts[node])):
+            found.add(node)
+    return found
+
+
+def _size(over):
+    """returns the number of points of the sweep"""
+    sizes = {len(values) for values in over.values()}
+    if len(sizes) > 1:
+        raise ValueError("swept inputs must all have as many values")
+    return sizes.pop() if sizes else 0
+
+
+def _expand(node, nodes, varying, over, size):
+    """Returns the nodes that stand for node in the graph of the sweep: one per
+    point, named (node, i). If node is vectorized, they pick their values out
+    of the one of the node named (node,), which evaluates it for all the
+    points at once."""
+    spec = u.node_spec(nodes[node])
+    swept = lambda arg: arg in over or arg in varying
+    if not isinstance(nodes[node], u.Vectorized):
+        return {
+            (node, i): u.At(
+                *[(arg, i) if swept(arg) else arg for arg in spec.args], spec.value
+            )
+            for i in range(size)
+        }
+
+    names, counts = [], []
+    for arg in spec.args:
+        if not swept(arg):
+            names.append(arg)
+            counts.append(None)
+        elif arg in varying and isinstance(nodes[arg], u.Vectorized):
+            # values of vectorized nodes are handed over as they are
+            names.append((arg,))
+            counts.append(None)
+        else:
+            names.extend((arg, i) for i in range(size))
+            counts.append(size)
+    expanded = {(node,): u.At(*names, _Batched(node, spec, counts, size))}
+    expanded.update({(node, i): u.At((node,), _Pick(i)) for i in range(size)})
+    return expanded
+
+
+class _Batched:
+    """Function of the node that evaluates a vectorized node for all the points
+    of a sweep. It is called with the values of the arguments of the node,
+    where the arguments that vary from point to point are given for every
+    point, stacks those and checks that the node returns one value per
+    point."""
+
+    def __init__(self, node, spec, counts, size):
+        self._node = node
+        self._spec = spec
+        self._counts = counts
+        self._size = size
+        self.__signature__ = u.positional_signature(
+            sum(count or 1 for count in counts)
+        )
+
+    def __call__(self, *args):
+        values, start = [], 0
+        for count in self._counts:
+            if count is None:
+                values.append(args[start])
+                start += 1
+            else:
+                values.append(_stack(args[start : start + count]))
+                start += count
+        value = self._spec.value(*values)
+        if len(value) != self._size:
+            raise ValueError(
+                "vectorized node [{}] returned {} values for {} points".format(
+                    self._node, len(value), self._size
+                )
+            )
+        return value
+
+
+class _Pick:
+    """function of the copy of a vectorized node for a point of the sweep"""
+
+    def __init__(self, index):
+        self._index = index
+
+    def __call__(self, values):
+        return values[self._index]
+
+
+def _stack(values):
+    """returns the given values as a NumPy array, or as a list if NumPy is not
+    installed"""
+    try:
+        import numpy  # pylint: disable=C0415
+    except ImportError:
+        return list(values)
+    return numpy.asarray(values)
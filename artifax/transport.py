@@ -0,0 +1,252 @@
+""" transport.py
+
+This module hosts the SharedMemoryTransport class, which lets the process
+solvers pass large buffers, i.e. NumPy arrays, bytes, bytearrays and
+memoryviews, to and from worker processes through shared memory segments
+rather than pickling them through pipes. Only small handles cross process
+boundaries: workers map the segments of their arguments without copying them
+and write their large results into new segments. The building process maps
+the segments of array and memoryview results and returns read-only views of
+them, while bytes and bytearray results are copied out of their segments,
+which are unlinked right away.
+
+Segments belong to the build that creates them, not to the resource tracker
+of the processes that happen to open them, and are unlinked when the build is
+done, whether it succeeds or not, or as soon as the value they hold is
+released by the building process. The views returned by a build keep their
+memory mapped until they are released.
+"""
+
+import secrets
+import sys
+import weakref
+from collections import namedtuple
+from functools import partial
+from itertools import count
+from multiprocessing import resource_tracker, shared_memory
+
+from exos import each
+
+__author__ = "Bruno Lange"
+__email__ = "blangeram@gmail.com"
+__license__ = "MIT"
+
+
+_Handle = namedtuple("_Handle", ["name", "kind", "nbytes", "meta"])
+
+# segments that workers could not close because views of them were still alive
+_lingering = []
+
+
+def _kind(value):
+    """returns the kind of buffer the value is, or None if it is not one that
+    can be shipped through shared memory"""
+    if isinstance(value, memoryview) and len(value.format) > 1:
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return type(value).__name__
+    numpy = sys.modules.get("numpy")
+    if (
+        numpy is not None
+        and isinstance(value, numpy.ndarray)
+        and not value.dtype.hasobject
+    ):
+        return "ndarray"
+    return None
+
+
+def _open(name=None, create=False, size=0):
+    """opens, or creates, a segment out of reach of the resource tracker. New
+    segments are given a random name unless one is provided."""
+    segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+    resource_tracker.unregister(segment._name, "shared_memory")  # pylint: disable=W0212
+    return segment
+
+
+def _unlink(segment, close=True):
+    # unlink reports to the resource tracker, which must know the segment
+    resource_tracker.register(segment._name, "shared_memory")  # pylint: disable=W0212
+    if close:
+        _close(segment)
+    segment.unlink()
+
+
+def _close(segment):
+    try:
+        segment.close()
+    except BufferError:
+        _lingering.append(segment)
+
+
+def _export(value, kind, name=None):
+    """copies value into a new segment and returns its handle along with the
+    segment"""
+    if kind == "ndarray":
+        import numpy  # pylint: disable=C0415
+
+        meta = (value.dtype.str, value.shape)
+        value = numpy.ascontiguousarray(value)
+        data = memoryview(value.reshape(-1).view("B")) if value.size else b""
+    elif kind == "memoryview":
+        meta = (value.format, value.shape)
+        data = value.cast("B") if value.c_contiguous else value.tobytes()
+    else:
+        meta, data = None, value
+    nbytes = len(data)
+    segment = _open(name, create=True, size=max(1, nbytes))
+    segment.buf[:nbytes] = data
+    return _Handle(segment.name, kind, nbytes, meta), segment
+
+
+def _view(handle, segment):
+    """returns the value held by the segment. Arrays and memoryviews are
+    read-only views of the segment whereas bytes and bytearrays are copies."""
+    buf = segment.buf[: handle.nbytes]
+    if handle.kind == "ndarray":
+        import numpy  # pylint: disable=C0415
+
+        dtype, shape = handle.meta
+        array = numpy.ndarray(shape, dtype=numpy.dtype(dtype), buffer=buf)
+        array.flags.writeable = False
+        return array
+    if handle.kind == "memoryview":
+        fmt, shape = handle.meta
+        return buf.toreadonly().cast(fmt, shape) if shape else buf.toreadonly()
+    return bytes(buf) if handle.kind == "bytes" else bytearray(buf)
+
+
+def _remote(run, min_bytes, name, spec, *args):
+    """Runs in worker processes. Maps the arguments that were shipped through
+    shared memory, evaluates the node with run and ships its value back
+    through a new segment with the given name if it is a buffer of at least
+    min_bytes bytes."""
+    lingering = list(_lingering)
+    del _lingering[:]
+    each(_close, lingering)
+    segments = []
+    try:
+        args = [
+            _map(arg, segments) if isinstance(arg, _Handle) else arg for arg in args
+        ]
+        value, stamp = run(spec, *args)
+        args = None
+        kind = _kind(value)
+        if kind is None or _nbytes(value) < min_bytes:
+            return value, stamp
+        handle, segment = _export(value, kind, name)
+        _close(segment)
+        return handle, stamp
+    finally:
+        for segment in segments:
+            _close(segment)
+
+
+def _map(handle, segments):
+    segment = _open(handle.name)
+    segments.append(segment)
+    return _view(handle, segment)
+
+
+def _nbytes(value):
+    return value.nbytes if hasattr(value, "nbytes") else len(value)
+
+
+class SharedMemoryTransport:
+    """Ships the large buffer arguments of the nodes of a build to worker
+    processes, and receives their large buffer values, through shared memory.
+    Every value is written to shared memory at most once per build, whether
+    it is shipped to one worker or many.
+
+    Args:
+        min_bytes (int, optional): size, in bytes, from which buffers go
+            through shared memory. Smaller values are pickled as usual.
+    """
+
+    MIN_BYTES = 2**20
+
+    def __init__(self, min_bytes=MIN_BYTES):
+        self._min_bytes = max(1, min_bytes)
+        self._prefix = "afx_{}_".format(secrets.token_hex(4))
+        self._counter = count()
+        self._segments = {}
+        self._shipped = {}
+        self._pending = {}
+        self._mapped = set()
+
+    def wrap(self, run):
+        """returns the function to hand to the pool in place of run"""
+        return partial(_remote, run, self._min_bytes)
+
+    def ship(self, node, task):
+        """Returns the (spec, *args) task of the node with its large buffer
+        arguments replaced by the handles of the segments that hold them and
+        prefixed by the name of the segment the worker may ship the value of
+        the node back through."""
+        name = self._pending[node] = self._prefix + str(next(self._counter))
+        return (name, task[0]) + tuple(self._handle(arg) for arg in task[1:])
+
+    def _handle(self, value):
+        kind = _kind(value)
+        if kind is None or _nbytes(value) < self._min_bytes:
+            return value
+        entry = self._shipped.get(id(value))
+        if entry is not None and entry[1]() is value:
+            return entry[0]
+        handle, segment = _export(value, kind)
+        self._track(value, handle, segment)
+        return handle
+
+    def receive(self, node, result):
+        """Returns the (value, stamp) result of the worker that evaluated the
+        node with the value taken out of shared memory if it was shipped
+        through it. Arrays and memoryviews are read-only views of their
+        segment, which is kept so that they can be shipped to other workers
+        for free, and which stays mapped until they are released. Bytes and
+        bytearrays are copies and their segment is unlinked right away."""
+        del self._pending[node]
+        handle, stamp = result
+        if not isinstance(handle, _Handle):
+            return result
+        segment = _open(handle.name)
+        value = _view(handle, segment)
+        if handle.kind in ("bytes", "bytearray"):
+            _unlink(segment)
+            return value, stamp
+        # the mapping goes away with the last view of the segment
+        weakref.finalize(value, _close, segment)
+        self._mapped.add(handle.name)
+        self._track(value, handle, segment)
+        return value, stamp
+
+    def _track(self, value, handle, segment):
+        key = id(value)
+        self._segments[handle.name] = segment
+        try:
+            ref = weakref.ref(value, lambda _: self._release(key, handle.name))
+        except TypeError:
+            # bytes and the like can not be weakly referenced, so they are
+            # held, along with their segments, until the build is done
+            ref = lambda: value  # pylint: disable=C3001
+        self._shipped[key] = (handle, ref)
+
+    def _release(self, key, name):
+        entry = self._shipped.get(key)
+        if entry is not None and entry[0].name == name:
+            del self._shipped[key]
+        segment = self._segments.pop(name, None)
+        if segment is not None:
+            _unlink(segment, close=name not in self._mapped)
+
+    def close(self):
+        """unlinks every segment of the build, including the ones that workers
+        created for values that were never received"""
+        self._shipped.clear()
+        while self._segments:
+            name, segment = self._segments.popitem()
+            _unlink(segment, close=name not in self._mapped)
+        self._mapped.clear()
+        while self._pending:
+            try:
+                _unlink(_open(self._pending.popitem()[1]))
+            except FileNotFoundError:
+                pass
@@ -2,8 +2,10 @@
 """
 
 import os
-from functools import reduce
-from inspect import signature
+import sys
+import weakref
+from collections import deque, namedtuple
+from inspect import Parameter, Signature, signature
 
 from . import exceptions
 
@@ -12,15 +14,84 @@ __email__ = "blangeram@gmail.com"
 __license__ = "MIT"
 
 
-arglist = lambda v: (
-    list(signature(v).parameters.keys()) if callable(v) else v.args() if isinstance(v, At) else []
-)
+NodeSpec = namedtuple("NodeSpec", ["args", "value", "is_at", "is_callable", "arity"])
+NodeSpec.__doc__ = """Describes how a node value gets evaluated: the names of the nodes
+it depends on, the value to be applied to them (the wrapped function in the
+case of an At instance), whether that value is callable and how many
+arguments it takes."""
+
+_specs = {}
+
+
+def node_spec(value):
+    """returns the NodeSpec of the given node value.
+
+    Specs of functions and At instances are cached by identity and evicted
+    along with the value itself, so each function signature is inspected
+    only once no matter how many times its graph gets built.
+    """
+    if isinstance(value, (Stream, Vectorized)):
+        return node_spec(value.value())
+
+    entry = _specs.get(id(value))
+    if entry is not None and entry[0]() is value:
+        return entry[1] if entry[1].is_at else entry[1]._replace(value=value)
+
+    if isinstance(value, At):
+        func = value.value()
+        spec = NodeSpec(
+            tuple(value.args()),
+            func,
+            True,
+            callable(func),
+            len(node_spec(func).args),
+        )
+    elif callable(value):
+        args = tuple(signature(value).parameters.keys())
+        spec = NodeSpec(args, value, False, True, len(args))
+    else:
+        return NodeSpec((), value, False, False, 0)
+
+    key = id(value)
+    try:
+        ref = weakref.ref(value, lambda _: _specs.pop(key, None))
+    except TypeError:
+        # builtins and the like can not be weakly referenced
+        return spec
+    # the cached spec must not hold on to the very value it is keyed by
+    _specs[key] = (ref, spec if spec.is_at else spec._replace(value=None))
+    return spec
+
+
+arglist = lambda v: list(node_spec(v).args)
+
+
+def positional_signature(arity):
+    """returns the signature of a function that takes arity positional-only
+    arguments, named x0, x1 and so on, for the callables that stand in for
+    nodes and are called with the values of their arguments in order"""
+    return Signature(
+        [Parameter("x{}".format(i), Parameter.POSITIONAL_ONLY) for i in range(arity)]
+    )
 
 
 def to_graph(artifacts):
     """returns a graph representation of the given artifacts"""
-    af_args = {k: arglist(v) for k, v in artifacts.items()}
-    return {key: [k for k, v in af_args.items() if key in v] for key in artifacts}
+    graph = {key: [] for key in artifacts}
+    for node, value in artifacts.items():
+        for arg in dict.fromkeys(arglist(value)):
+            if arg in graph:
+                graph[arg].append(node)
+    return graph
+
+
+def indegrees(graph):
+    """returns the number of incoming edges of every node in the given graph"""
+    degrees = dict.fromkeys(graph, 0)
+    for neighbors in graph.values():
+        for neighbor in neighbors:
+            degrees[neighbor] += 1
+    return degrees
 
 
 def topological_sort(graph):
@@ -29,40 +100,155 @@ def topological_sort(graph):
     Throws artifax.CircularDependencyError
     if graph is not a Direct Acyclic Graph (DAG)
     """
-
-    def _visit(node, temp, perm, tlist):
-        if node in perm:
-            return
-        if node in temp:
-            raise exceptions.CircularDependencyError("artifact graph is not a DAG")
-        temp.add(node)
+    degrees = indegrees(graph)
+    frontier = deque(node for node, degree in degrees.items() if degree == 0)
+    tlist = []
+    while frontier:
+        node = frontier.popleft()
+        tlist.append(node)
         for neighbor in graph[node]:
-            _visit(neighbor, temp, perm, tlist)
-        perm.add(node)
-        tlist.insert(0, node)
+            degrees[neighbor] -= 1
+            if not degrees[neighbor]:
+                frontier.append(neighbor)
 
-    unmarked = set(graph.keys())
-    temp = set()
-    perm = set()
-    tlist = []
-    while unmarked:
-        node = unmarked.pop()
-        _visit(node, temp, perm, tlist)
+    if len(tlist) < len(graph):
+        raise exceptions.CircularDependencyError(
+            "artifact graph is not a DAG", nodes=_cyclic(graph, degrees)
+        )
     return tlist
 
 
-def initial(graph):
-    def to_mask(mask, node, graph, key):
-        neighbors = graph[node]
+def _cyclic(graph, degrees):
+    """given the in-degrees left over by an interrupted topological sort,
+    returns the nodes that lie on a cycle or between cycles"""
+    residual = {node for node, degree in degrees.items() if degree}
+    outdegrees = {
+        node: sum(1 for neighbor in graph[node] if neighbor in residual)
+        for node in residual
+    }
+    sinks = deque(node for node, degree in outdegrees.items() if not degree)
+    parents = {node: [] for node in residual}
+    for node in residual:
+        for neighbor in graph[node]:
+            if neighbor in residual:
+                parents[neighbor].append(node)
+    while sinks:
+        node = sinks.popleft()
+        residual.discard(node)
+        for parent in parents[node]:
+            outdegrees[parent] -= 1
+            if not outdegrees[parent]:
+                sinks.append(parent)
+    return [node for node in graph if node in residual]
+
+
+def critical_path(graph, costs):
+    """returns, for every node of the given graph, the total cost of the most
+    expensive path that starts at it, itself included. Nodes that are missing
+    from costs are assumed to cost as much as the average known node.
+
+    Throws artifax.CircularDependencyError
+    if graph is not a Direct Acyclic Graph (DAG)
+    """
+    known = [costs[node] for node in graph if node in costs]
+    default = sum(known) / len(known) if known else 1.0
+    ranks = {}
+    for node in reversed(topological_sort(graph)):
+        ranks[node] = costs.get(node, default) + max(
+            (ranks[neighbor] for neighbor in graph[node]), default=0
+        )
+    return ranks
+
+
+def fusion(graph, costs=None, cheap=0.0, exclude=()):
+    """Returns the groups of nodes of the given graph that can be evaluated one
+    after the other in a single task, as a dictionary that maps the first
+    node of each group to the tuple of its nodes in topological order. Nodes
+    that are in no group are left out.
+
+    A node joins the group of its dependencies if they all belong to the same
+    one and either it is the only node outside of the group that depends on
+    any of its nodes, which makes up chains, or it is estimated by costs to
+    take at most cheap seconds. Nodes that are missing from costs are not
+    deemed cheap. Excluded nodes join no group.
+
+    Throws artifax.CircularDependencyError
+    if graph is not a Direct Acyclic Graph (DAG)
+    """
+    costs = costs or {}
+    exclude = set(exclude)
+    parents = {node: set() for node in graph}
+    for node, neighbors in graph.items():
         for neighbor in neighbors:
-            mask[key[neighbor]] = 1
-        return mask
+            parents[neighbor].add(node)
 
-    nodes = list(graph.keys())
-    key = {nodes[i]: i for i in range(len(nodes))}
-    mask = reduce(lambda m, n: to_mask(m, n, graph, key), nodes, [0] * len(nodes))
+    heads, members, exits = {}, {}, {}
+    for node in topological_sort(graph):
+        if node in exclude:
+            continue
+        found = {heads.get(parent) for parent in parents[node]}
+        head = found.pop() if len(found) == 1 else None
+        if head is not None and (
+            exits[head] == {node} or costs.get(node, float("inf")) <= cheap
+        ):
+            members[head].append(node)
+            exits[head].discard(node)
+        else:
+            head = node
+            members[head], exits[head] = [node], set()
+        heads[node] = head
+        exits[head].update(graph[node])
+    return {head: tuple(nodes) for head, nodes in members.items() if len(nodes) > 1}
 
-    return set(nodes[i] for i in range(len(mask)) if mask[i] == 0)
+
+def initial(graph):
+    """returns the nodes of the given graph that have no incoming edges"""
+    degrees = indegrees(graph)
+    return {node for node, degree in degrees.items() if not degree}
+
+
+def equal(a, b):
+    """tells whether two node values are the same. Values of different types
+    are never equal, not even 1 and 1.0, and neither are lists, tuples and
+    dicts whose items are not equal in that sense. Array-like values, whose
+    comparison is element-wise, are equal if they have the same shape and
+    elements. Values that can not be compared are never equal."""
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(map(equal, a, b))
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(equal(a[key], b[key]) for key in a)
+    try:
+        result = a == b
+        if isinstance(result, bool):
+            return result
+        if not hasattr(result, "all"):
+            return bool(result)
+        if getattr(a, "shape", None) != getattr(b, "shape", None):
+            return False
+        return bool(result.all())
+    except Exception:  # pylint: disable=W0703
+        return False
+
+
+def sizeof(value):
+    """returns an estimate of the memory, in bytes, held by the given value:
+    the size of the buffer of array-like values that expose nbytes, the size
+    of the object itself otherwise"""
+    nbytes = getattr(value, "nbytes", None)
+    return nbytes if isinstance(nbytes, int) else sys.getsizeof(value)
+
+
+def drain(generator):
+    """runs generator to exhaustion and returns its return value"""
+    while True:
+        try:
+            next(generator)
+        except StopIteration as stop:
+            return stop.value
 
 
 def pprint(*args, **kwargs):
@@ -97,3 +283,77 @@ class At:
     def value(self):
         """returns lambda"""
         return self._value
+
+
+class Stream:
+    """The Stream class marks a streaming node. The node it wraps, either a
+    function or an At instance, returns an iterable of chunks, typically a
+    generator, rather than a complete value.
+
+    Chunks are pulled from a thread of their own, once a dependent starts
+    reading, and handed to each dependent as they are produced, so that the
+    dependents consume them while they are being produced, one at a time.
+    Dependents get an iterator over the chunks as their argument: streaming
+    ones turn it into chunks of their own and the others reduce it to a
+    value. The memory held by a pipeline of streaming nodes does not grow
+    with the size of the data that flows through it, save for the chunks
+    buffered for the dependents that have yet to start reading, which only
+    the threads solver runs alongside the others.
+
+    For example:
+    {
+        'lines': Stream(lambda path: open(path)),
+        'records': Stream(lambda lines: map(parse, lines)),
+        'total': lambda records: sum(r.amount for r in records),
+    }
+
+    Args:
+        value: function, or At instance, that returns the chunks.
+        maxsize (int, optional): number of chunks that can be queued for
+            a dependent that is reading before the node waits for it to
+            catch up.
+    """
+
+    def __init__(self, value, maxsize=16):
+        self._value = value
+        self.maxsize = maxsize
+
+    def args(self):
+        """returns list of the arguments of the wrapped node"""
+        return node_spec(self._value).args
+
+    def value(self):
+        """returns the wrapped node"""
+        return self._value
+
+
+class Vectorized:
+    """The Vectorized class marks a node whose function, or At instance, works
+    on whole arrays of values as well as on single values. It is an ordinary
+    node in builds, but a parameter sweep evaluates it once for all of its
+    points rather than once per point: the arguments that vary from point to
+    point are given as NumPy arrays, or as lists where NumPy is not
+    installed, and the node must return a sequence with one value per point.
+
+    For example:
+    {
+        'rate': 0.05,
+        'discount': Vectorized(lambda rate, years: (1 + rate) ** -years),
+    }
+
+    swept over years with artifax.sweep calls the lambda only once.
+
+    Args:
+        value: function, or At instance, of the node.
+    """
+
+    def __init__(self, value):
+        self._value = value
+
+    def args(self):
+        """returns list of the arguments of the wrapped node"""
+        return node_spec(self._value).args
+
+    def value(self):
+        """returns the wrapped node"""
+        return self._value
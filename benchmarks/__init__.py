@@ -0,0 +1,9 @@
+"""Benchmarks of artifax. The dags module generates synthetic graphs and the
+runner module times artifax on them. Run from the root of the repository:
+
+    $ python -m benchmarks run --sizes 100 1000 10000 --output base.json
+    $ python -m benchmarks compare base.json new.json
+
+The scripts in this directory can be run on their own as well, as modules of
+the package, e.g. python -m benchmarks.critical_path.
+"""
@@ -0,0 +1,63 @@
+"""__main__.py
+
+Command line interface of the benchmark suite.
+
+    $ python -m benchmarks run [--shapes ...] [--sizes ...] [--cases ...]
+          [--cost SECONDS] [--sleep] [--repeat N] [--budget SECONDS]
+          [--workers N] [--output PATH]
+    $ python -m benchmarks compare BASELINE CURRENT [--threshold RATIO]
+
+The compare command exits with status 1 if any case regressed.
+"""
+
+import argparse
+import sys
+
+from . import dags, runner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="time artifax on synthetic DAGs")
+    run.add_argument("--shapes", nargs="+", choices=dags.SHAPES, default=dags.SHAPES)
+    run.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000])
+    run.add_argument("--cases", nargs="+", choices=runner.CASES, default=runner.CASES)
+    run.add_argument("--cost", type=float, default=0.0, help="seconds per node")
+    run.add_argument("--sleep", action="store_true", help="sleep instead of spin")
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--budget", type=float, help="seconds before not repeating")
+    run.add_argument("--workers", type=int, help="size of the worker pools")
+    run.add_argument("--output", help="path of the JSON recording")
+
+    compare = commands.add_parser("compare", help="flag regressions between runs")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        results = runner.run(
+            shapes=args.shapes,
+            sizes=args.sizes,
+            cases=args.cases,
+            cost=args.cost,
+            sleep=args.sleep,
+            repeat=args.repeat,
+            budget=args.budget,
+            workers=args.workers,
+            log=sys.stdout,
+        )
+        if args.output:
+            runner.save(results, args.output)
+        return 0
+
+    rows = runner.compare(
+        runner.load(args.baseline), runner.load(args.current), args.threshold
+    )
+    return 1 if runner.report(rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
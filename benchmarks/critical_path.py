@@ -0,0 +1,63 @@
+"""critical_path.py
+
+Compares the makespan of the threads solver when ready nodes are started in
+FIFO order against critical-path ordering, on synthetic DAGs made of one long
+chain and many short independent branches.
+
+    $ python -m benchmarks.critical_path
+"""
+
+import time
+
+from artifax import At, build
+
+
+def _sleeper(seconds):
+    def _sleep(*_):
+        time.sleep(seconds)
+
+    return _sleep
+
+
+def skewed(chain, branches, cost=0.01):
+    """returns a DAG where a source node feeds `branches` independent nodes
+    and a chain of `chain` nodes, all taking `cost` seconds to run. The
+    branches come first so that FIFO ordering starts them before the chain."""
+    artifacts = {"source": None}
+    artifacts.update(
+        {"branch{}".format(i): At("source", _sleeper(cost)) for i in range(branches)}
+    )
+    previous = "source"
+    for i in range(chain):
+        artifacts["chain{}".format(i)] = At(previous, _sleeper(cost))
+        previous = "chain{}".format(i)
+    return artifacts
+
+
+def makespan(artifacts, workers, costs=None):
+    start = time.perf_counter()
+    build(artifacts, solver="threads", max_workers=workers, costs=costs)
+    return time.perf_counter() - start
+
+
+def main():
+    print(
+        "{:>6} {:>9} {:>8} {:>9} {:>9} {:>8}".format(
+            "chain", "branches", "workers", "fifo", "critical", "speedup"
+        )
+    )
+    for chain, branches, workers in [(20, 40, 2), (40, 80, 4), (50, 200, 8)]:
+        artifacts = skewed(chain, branches)
+        costs = {}
+        build(artifacts, solver="threads", max_workers=workers, durations=costs)
+        fifo = makespan(artifacts, workers)
+        critical = makespan(artifacts, workers, costs=costs)
+        print(
+            "{:>6} {:>9} {:>8} {:>9.3f} {:>9.3f} {:>7.2f}x".format(
+                chain, branches, workers, fifo, critical, fifo / critical
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""dags.py
+
+Generators of synthetic artifact graphs for the benchmarks. Every generator
+takes the number of nodes and the cost, in seconds, of evaluating each one of
+them, and returns an artifacts dictionary whose nodes are Kernel instances
+wrapped in At. The value of each node is its depth in the graph.
+"""
+
+import random
+import time
+from functools import lru_cache
+from inspect import Parameter, Signature
+
+from artifax import At
+
+SHAPES = ("chain", "fan", "diamonds", "layered", "random")
+
+
+class Kernel:
+    """Callable that takes as many positional arguments as its arity and,
+    before returning one plus the largest of them, either burns `cost`
+    seconds of CPU time or sleeps for that long.
+
+    Its signature is declared rather than variadic so that artifax applies
+    it to all of its arguments at once. Being a plain instance, it can be
+    shipped to worker processes.
+    """
+
+    def __init__(self, arity, cost=0.0, sleep=False):
+        self.arity = arity
+        self.cost = cost
+        self.sleep = sleep
+        self.__signature__ = Signature(
+            [
+                Parameter("x{}".format(i), Parameter.POSITIONAL_ONLY)
+                for i in range(arity)
+            ]
+        )
+
+    def __call__(self, *inputs):
+        if self.cost and self.sleep:
+            time.sleep(self.cost)
+        elif self.cost:
+            deadline = time.perf_counter() + self.cost
+            while time.perf_counter() < deadline:
+                pass
+        return 1 + max(inputs, default=-1)
+
+
+@lru_cache(maxsize=None)
+def _kernel(arity, cost, sleep):
+    """kernels are shared by the nodes with the same arity and cost"""
+    return Kernel(arity, cost, sleep)
+
+
+def _node(args, cost, sleep):
+    kernel = _kernel(len(args), cost, sleep)
+    return At(*args, kernel) if args else kernel
+
+
+def _name(i):
+    return "n{}".format(i)
+
+
+def chain(size, cost=0.0, sleep=False):
+    """n0 <- n1 <- ... : every node depends on the previous one"""
+    return {
+        _name(i): _node([_name(i - 1)] if i else [], cost, sleep) for i in range(size)
+    }
+
+
+def fan(size, cost=0.0, sleep=False):
+    """a root that feeds every other node"""
+    return {_name(i): _node([_name(0)] if i else [], cost, sleep) for i in range(size)}
+
+
+def diamonds(size, cost=0.0, sleep=False):
+    """a ladder of diamonds: every third node joins the two nodes that fork
+    from the previous join"""
+    artifacts = {}
+    join = None
+    for i in range(size):
+        if not i:
+            args = []
+        elif i % 3:
+            args = [join]
+        else:
+            args = [_name(i - 2), _name(i - 1)]
+        artifacts[_name(i)] = _node(args, cost, sleep)
+        if not i % 3:
+            join = _name(i)
+    return artifacts
+
+
+def layered(size, cost=0.0, sleep=False, width=None, fan_in=2, seed=0):
+    """layers of `width` nodes, square root of size by default, where every
+    node depends on up to `fan_in` random nodes of the previous layer"""
+    rng = random.Random(seed)
+    width = width or max(1, int(size**0.5))
+    artifacts = {}
+    for i in range(size):
+        layer = i // width
+        if not layer:
+            args = []
+        else:
+            previous = range((layer - 1) * width, layer * width)
+            args = rng.sample(previous, min(fan_in, width))
+        artifacts[_name(i)] = _node([_name(arg) for arg in args], cost, sleep)
+    return artifacts
+
+
+def random_dag(size, cost=0.0, sleep=False, fan_in=2, seed=0):
+    """every node depends on up to `fan_in` randomly chosen earlier nodes"""
+    rng = random.Random(seed)
+    return {
+        _name(i): _node(
+            sorted({_name(rng.randrange(i)) for _ in range(min(i, fan_in))}),
+            cost,
+            sleep,
+        )
+        for i in range(size)
+    }
+
+
+def generate(shape, size, cost=0.0, sleep=False):
+    """returns the artifacts of the given shape, one of SHAPES"""
+    generators = {
+        "chain": chain,
+        "fan": fan,
+        "diamonds": diamonds,
+        "layered": layered,
+        "random": random_dag,
+    }
+    if shape not in generators:
+        raise ValueError("unknown shape [{}]".format(shape))
+    return generators[shape](size, cost=cost, sleep=sleep)
@@ -0,0 +1,190 @@
+"""runner.py
+
+Times graph construction, topological sorting, every solver and incremental
+Artifax builds on the synthetic DAGs of the dags module, records the results
+to JSON and compares two such recordings to flag regressions.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+
+import artifax
+from artifax import Artifax, build, utils
+
+from . import dags
+
+SOLVERS = ("linear", "bfs", "bfs_parallel", "fork", "async", "threads")
+CASES = ("to_graph", "topological_sort") + SOLVERS + ("incremental", "cutoff")
+
+
+def _incremental(artifacts, cutoff):
+    """returns a callable that, on an Artifax instance that has been built
+    once, sets the root with the most dependents again and rebuilds the
+    graph. Without early cutoff, every descendant of the root is evaluated
+    again."""
+    afx = Artifax(artifacts)
+    if not cutoff:
+        afx.equality(None)
+    afx.build()
+    graph = utils.to_graph(artifacts)
+    first = max(utils.initial(graph), key=lambda node: len(graph[node]))
+
+    def run():
+        afx.set(first, artifacts[first])
+        afx.build()
+
+    return run
+
+
+def _case(name, artifacts, workers):
+    """returns a callable that runs the named case on the given artifacts"""
+    if name == "to_graph":
+        return lambda: utils.to_graph(artifacts)
+    if name == "topological_sort":
+        graph = utils.to_graph(artifacts)
+        return lambda: utils.topological_sort(graph)
+    if name in ("incremental", "cutoff"):
+        return _incremental(artifacts, cutoff=name == "cutoff")
+    if name in ("bfs_parallel", "fork", "async"):
+        return lambda: build(artifacts, solver=name, processes=workers)
+    if name == "threads":
+        return lambda: build(artifacts, solver=name, max_workers=workers)
+    return lambda: build(artifacts, solver=name)
+
+
+def measure(run, repeat=3, budget=None):
+    """returns the wall-clock times of `repeat` calls of run. Stops repeating
+    once the calls have taken more than `budget` seconds altogether."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+        if budget is not None and sum(times) > budget:
+            break
+    return times
+
+
+def run(
+    shapes=dags.SHAPES,
+    sizes=(100, 1000, 10000),
+    cases=CASES,
+    cost=0.0,
+    sleep=False,
+    repeat=3,
+    budget=None,
+    workers=None,
+    log=None,
+):
+    """Runs every case on every shape and size and returns the results as a
+    JSON-serializable dictionary. Each result holds the best, median and
+    every time measured.
+
+    Args:
+        shapes (iterable): DAG shapes, see dags.SHAPES.
+        sizes (iterable): numbers of nodes.
+        cases (iterable): the cases to time, see CASES.
+        cost (float): time, in seconds, that each node takes to evaluate.
+        sleep (bool): whether nodes sleep rather than burn CPU time.
+        repeat (int): number of times each case is timed.
+        budget (float, optional): seconds after which a case is not repeated.
+        workers (int, optional): size of the pools of the parallel solvers.
+        log (file, optional): stream where progress is reported.
+    """
+    results = []
+    for shape in shapes:
+        for size in sizes:
+            artifacts = dags.generate(shape, size, cost=cost, sleep=sleep)
+            for name in cases:
+                times = measure(_case(name, artifacts, workers), repeat, budget)
+                result = {
+                    "shape": shape,
+                    "size": size,
+                    "case": name,
+                    "best": min(times),
+                    "median": sorted(times)[len(times) // 2],
+                    "times": times,
+                }
+                results.append(result)
+                if log is not None:
+                    print(_row(result), file=log, flush=True)
+    return {
+        "meta": {
+            "artifax": getattr(artifax, "__version__", None),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "cost": cost,
+            "sleep": sleep,
+            "workers": workers,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def _row(result):
+    return "{:<10} {:>9} {:<18} {:>12.6f}".format(
+        result["shape"], result["size"], result["case"], result["best"]
+    )
+
+
+def _key(result):
+    return result["shape"], result["size"], result["case"]
+
+
+def compare(baseline, current, threshold=0.1, floor=1e-4):
+    """Compares the best times of two recordings, as returned by run, and
+    returns a list of (shape, size, case, baseline, current, ratio, flag)
+    tuples for the results they have in common. Results that got slower by
+    more than `threshold`, relative to the baseline, are flagged as
+    'regression' and the ones that got faster by as much as 'improvement'.
+    Differences between times below `floor` seconds are ignored as noise.
+    """
+    reference = {_key(result): result["best"] for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        key = _key(result)
+        if key not in reference:
+            continue
+        before, after = reference[key], result["best"]
+        ratio = after / before if before else float("inf")
+        flag = ""
+        if max(before, after) >= floor:
+            if ratio > 1 + threshold:
+                flag = "regression"
+            elif ratio < 1 / (1 + threshold):
+                flag = "improvement"
+        rows.append(key + (before, after, ratio, flag))
+    return rows
+
+
+def load(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save(results, path):
+    with open(path, "w") as handle:
+        json.dump(results, handle, indent=2)
+
+
+def report(rows, out=sys.stdout):
+    """prints the rows returned by compare and returns the number of
+    regressions"""
+    header = "{:<10} {:>9} {:<18} {:>12} {:>12} {:>8}  {}"
+    print(
+        header.format("shape", "size", "case", "baseline", "current", "ratio", ""),
+        file=out,
+    )
+    for shape, size, case, before, after, ratio, flag in rows:
+        print(
+            "{:<10} {:>9} {:<18} {:>12.6f} {:>12.6f} {:>8.2f}  {}".format(
+                shape, size, case, before, after, ratio, flag
+            ),
+            file=out,
+        )
+    return sum(1 for row in rows if row[-1] == "regression")
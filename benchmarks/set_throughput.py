@@ -0,0 +1,57 @@
+"""set_throughput.py
+
+Measures how many nodes per second can be loaded into an Artifax instance
+one `set` call at a time and with a single `update` call.
+
+    $ python -m benchmarks.set_throughput 1000 10000 100000 1000000
+"""
+
+import random
+import sys
+import time
+
+from artifax import Artifax, At
+
+
+def _add(*args):
+    return sum(args)
+
+
+def load(size, fan_in=2, seed=0, batched=False):
+    """sets `size` nodes where every node but the first depends on up to
+    `fan_in` randomly chosen earlier nodes, in a single update call if
+    batched. Returns the elapsed time."""
+    rng = random.Random(seed)
+    values = [
+        At(*["n{}".format(rng.randrange(i)) for _ in range(min(i, fan_in))], _add)
+        if i
+        else 1
+        for i in range(size)
+    ]
+    afx = Artifax()
+    start = time.perf_counter()
+    if batched:
+        afx.update({"n{}".format(i): value for i, value in enumerate(values)})
+    else:
+        for i, value in enumerate(values):
+            afx.set("n{}".format(i), value)
+    return time.perf_counter() - start
+
+
+def main(sizes):
+    row = "{:>10} {:>12} {:>14} {:>14}"
+    print(row.format("nodes", "seconds", "sets/second", "updates/second"))
+    for size in sizes:
+        elapsed, batched = load(size), load(size, batched=True)
+        print(
+            row.format(
+                size,
+                "{:.3f}".format(elapsed),
+                "{:.0f}".format(size / elapsed),
+                "{:.0f}".format(size / batched),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10**3, 10**4, 10**5, 10**6])
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from artifax import Artifax, abuild, build
+from artifax.exceptions import UnresolvedDependencyError
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def fetch(value, delay=0.1):
+    await asyncio.sleep(delay)
+    return value
+
+
+def test_abuild_matches_build():
+    artifacts = {
+        "a": 1,
+        "b": lambda a: a + 1,
+        "c": lambda a, b: a * b,
+    }
+    assert run(abuild(artifacts)) == build(artifacts)
+
+
+def test_abuild_awaits_coroutines_concurrently():
+    artifacts = {
+        "x": lambda: fetch(1),
+        "y": lambda: fetch(2),
+        "z": lambda: fetch(3),
+        "total": lambda x, y, z: x + y + z,
+    }
+    start = time.perf_counter()
+    result = run(abuild(artifacts))
+    assert time.perf_counter() - start < 0.25
+    assert result["total"] == 6
+
+
+def test_abuild_coroutine_functions():
+    async def double(a):
+        return await fetch(2 * a, delay=0)
+
+    assert run(abuild({"a": 21, "b": double}))["b"] == 42
+
+
+def test_abuild_concurrency_limit():
+    active, peak = [0], [0]
+
+    async def work(root):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01)
+        active[0] -= 1
+        return root
+
+    artifacts = {"n{}".format(i): work for i in range(10)}
+    run(abuild(artifacts, resolved={"root": 0}, concurrency=3))
+    assert peak[0] == 3
+
+
+def test_abuild_executor():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = run(abuild({"a": 2, "b": lambda a: a**10}, executor=executor))
+    assert result["b"] == 1024
+
+
+def test_abuild_errors():
+    with pytest.raises(UnresolvedDependencyError):
+        run(abuild({"a": lambda b: b}))
+
+    async def fail(a):
+        raise ValueError(a)
+
+    with pytest.raises(ValueError):
+        run(abuild({"a": 1, "b": fail, "c": lambda: fetch(0)}))
+
+
+def test_artifax_abuild():
+    afx = Artifax(a=1, b=lambda a: fetch(a + 1, delay=0), c=lambda a: a - 1)
+    assert run(afx.abuild(targets="b")) == 2
+    assert run(afx.abuild()) == {"a": 1, "b": 2, "c": 0}
+
+    afx.set("a", 10)
+    assert run(afx.abuild(targets=("b", "c"))) == (11, 9)
+
+
+def test_abuild_early_cutoff():
+    artifacts = {"a": 3, "b": lambda a: fetch(a % 2, delay=0), "c": lambda b: b}
+    previous = {"a": 1, "b": 1, "c": "kept"}
+    result = run(abuild(artifacts, previous=previous, changed={"a"}))
+    assert result["c"] == "kept"
@@ -1,10 +1,14 @@
 import json
+import os
+import time
+import warnings
 from functools import partial
 
+import pathos.multiprocessing as mp
 import pytest
 
-from artifax import At, build
-from artifax.exceptions import UnresolvedDependencyError
+from artifax import At, Stream, build, iter_build
+from artifax.exceptions import CircularDependencyError, UnresolvedDependencyError
 
 
 def test_empty_build():
@@ -112,7 +116,7 @@ def test_at_constructor():
 
 
 def test_deep_build():
-    for solver in ["linear", "bfs", "bfs_parallel", "async"]:
+    for solver in ["linear", "bfs", "bfs_parallel", "fork", "async", "threads"]:
         results = build(
             {
                 "a": "a",
@@ -126,7 +130,9 @@ def test_deep_build():
         assert results["c"] == "c"
 
 
-@pytest.mark.parametrize("solver", ["linear", "bfs", "bfs_parallel", "async"])
+@pytest.mark.parametrize(
+    "solver", ["linear", "bfs", "bfs_parallel", "fork", "async", "threads"]
+)
 def test_solver(solver):
     def subtract(p, q):
         return p - q
@@ -142,3 +148,370 @@ def test_solver(solver):
     )
 
     assert result == {"a": -11, "b": 7.5, "a - b": -18.5, "b - a": 18.5}
+
+
+def test_circular_dependency():
+    with pytest.raises(CircularDependencyError) as excinfo:
+        build({"x": lambda y: y, "y": lambda x: x, "z": lambda x: x})
+    assert excinfo.value.nodes == ["x", "y"]
+
+
+def test_long_chain_build():
+    artifacts = {"n0": 0}
+    artifacts.update(
+        {
+            "n{}".format(i): At("n{}".format(i - 1), lambda n: n + 1)
+            for i in range(1, 5000)
+        }
+    )
+    assert build(artifacts)["n4999"] == 4999
+
+
+@pytest.mark.parametrize(
+    "solver", ["linear", "bfs", "bfs_parallel", "fork", "async", "threads"]
+)
+def test_resolved(solver):
+    result = build(
+        {"c": lambda a, b: a + b, "d": lambda c: -c},
+        resolved={"a": 1, "b": 2},
+        solver=solver,
+    )
+    assert result == {"a": 1, "b": 2, "c": 3, "d": -3}
+
+
+def test_parallel_bfs_reuses_pool():
+    pool = mp.Pool(processes=2)
+    artifacts = {"a": 2, "b": 3, "c": lambda a: a + 1, "d": lambda b: b * 2}
+    try:
+        for _ in range(2):
+            result = build(artifacts, solver="bfs_parallel", pool=pool)
+            assert result == {"a": 2, "b": 3, "c": 3, "d": 6}
+    finally:
+        pool.close()
+        pool.join()
+
+
+def test_parallel_bfs_partial_functions():
+    result = build(
+        {"a": 2, "b": lambda a, x: a * x, "c": lambda a, y: a + y},
+        solver="bfs_parallel",
+        allow_partial_functions=True,
+    )
+    assert result["b"](5) == 10
+    assert result["c"](5) == 7
+
+
+@pytest.mark.parametrize("solver", ["bfs_parallel", "fork", "async", "threads"])
+def test_parallel_solver_errors(solver):
+    with pytest.raises(ZeroDivisionError):
+        build({"a": 0, "b": 1, "c": lambda a: 1 / a, "d": lambda b: b}, solver=solver)
+
+
+def test_async_wide_graph():
+    def total(a, b, c, d, e, f, g, h):
+        return a + b + c + d + e + f + g + h
+
+    artifacts = {"root": 1}
+    artifacts.update({"leaf{}".format(i): At("root", abs) for i in range(8)})
+    artifacts["total"] = At(*["leaf{}".format(i) for i in range(8)], total)
+    pool = mp.Pool(processes=2)
+    try:
+        result = build(artifacts, solver="async", pool=pool)
+    finally:
+        pool.close()
+        pool.join()
+    assert result["total"] == 8
+
+
+def test_threads_solver_shares_objects():
+    obj = object()
+    result = build(
+        {
+            "obj": obj,
+            "same": lambda obj: obj,
+            "pair": lambda obj, same: (obj, same),
+        },
+        solver="threads",
+        max_workers=2,
+    )
+    assert result["same"] is obj
+    assert all(item is obj for item in result["pair"])
+
+
+class _Unpicklable:
+    def __reduce__(self):
+        raise TypeError("not picklable")
+
+
+def test_fork_solver_inherits_values():
+    artifacts = {
+        "obj": lambda: _Unpicklable(),
+        "a": lambda obj: type(obj).__name__,
+        "b": lambda obj: os.getpid(),
+        "c": lambda a, b: (a, b),
+    }
+
+    result = build(artifacts, solver="fork", processes=2)
+
+    assert result["a"] == "_Unpicklable"
+    assert result["b"] != os.getpid()
+    assert result["c"] == (result["a"], result["b"])
+    with pytest.raises(TypeError):
+        build(artifacts, solver="bfs_parallel", processes=2)
+
+
+@pytest.mark.parametrize(
+    "solver", ["linear", "bfs", "bfs_parallel", "fork", "async", "threads"]
+)
+def test_durations(solver):
+    durations = {}
+    build(
+        {"a": 1, "b": lambda a: a, "c": lambda a: a, "d": lambda b, c: b + c},
+        solver=solver,
+        durations=durations,
+        resolved={"z": 0},
+    )
+    assert set(durations) == {"a", "b", "c", "d"}
+    assert all(elapsed >= 0 for elapsed in durations.values())
+
+
+def test_critical_path_scheduling():
+    order = []
+    artifacts = {
+        "short1": lambda: order.append("short1"),
+        "short2": lambda: order.append("short2"),
+        "long": lambda: order.append("long"),
+        "tail": lambda long: order.append("tail"),
+    }
+    build(artifacts, solver="threads", max_workers=1)
+    assert order == ["short1", "short2", "long", "tail"]
+
+    order.clear()
+    build(artifacts, solver="threads", max_workers=1, costs={"long": 5, "tail": 5})
+    assert order[0] == "long"
+
+
+@pytest.mark.parametrize(
+    "solver", ["linear", "bfs", "bfs_parallel", "fork", "async", "threads"]
+)
+def test_early_cutoff(solver):
+    artifacts = {
+        "config": {"scale": 2, "label": "new"},
+        "scale": lambda config: config["scale"],
+        "label": lambda config: config["label"],
+        "area": lambda scale: scale**2,
+        "title": lambda label: label.upper(),
+    }
+    previous = {
+        "config": {"scale": 2, "label": "old"},
+        "scale": 2,
+        "label": "old",
+        "area": "kept",
+        "title": "kept",
+    }
+    changed = {"config"}
+    result = build(artifacts, solver=solver, previous=previous, changed=changed)
+    assert result["area"] == "kept"
+    assert result["title"] == "NEW"
+    assert changed == {"config", "label", "title"}
+
+
+@pytest.mark.parametrize("solver", ["bfs_parallel", "async"])
+def test_fusion(solver):
+    artifacts = {
+        "a": lambda: os.getpid(),
+        "b": lambda a: (a, os.getpid()),
+        "c": lambda b: b + (os.getpid(),),
+        "x": lambda: os.getpid(),
+        "y": lambda x: (x, os.getpid()),
+    }
+    durations = {}
+    result = build(
+        artifacts, solver=solver, processes=2, fuse=True, durations=durations
+    )
+    assert len(set(result["c"])) == 1
+    assert len(set(result["y"])) == 1
+    assert set(durations) == set(artifacts)
+    pairs = list(iter_build(artifacts, solver=solver, processes=2, fuse=True))
+    assert sorted(node for node, _ in pairs) == sorted(artifacts)
+
+    with pytest.raises(UnresolvedDependencyError):
+        build({"a": 1, "b": lambda a, z: a, "c": lambda b: b}, solver=solver, fuse=True)
+    with pytest.raises(TypeError):
+        build(artifacts, solver="threads", fuse=True)
+
+
+@pytest.mark.parametrize("solver", ["bfs_parallel", "async"])
+def test_fusion_early_cutoff(solver):
+    artifacts = {
+        "config": {"scale": 2, "label": "new"},
+        "scale": lambda config: config["scale"],
+        "label": lambda config: config["label"],
+        "area": lambda scale: scale**2,
+        "title": lambda label: label.upper(),
+    }
+    previous = {"config": {"scale": 2, "label": "old"}, "scale": 2, "area": "kept"}
+    changed = {"config"}
+    result = build(
+        artifacts, solver=solver, previous=previous, changed=changed, fuse=True
+    )
+    assert result["area"] == "kept"
+    assert result["title"] == "NEW"
+    assert changed == {"config", "label", "title"}
+
+
+class _Blob:
+    alive = 0
+    peak = 0
+
+    def __init__(self, parent=None):
+        _Blob.alive += 1
+        _Blob.peak = max(_Blob.peak, _Blob.alive)
+
+    def __del__(self):
+        _Blob.alive -= 1
+
+
+@pytest.mark.parametrize(
+    "solver", ["linear", "bfs", "bfs_parallel", "fork", "async", "threads"]
+)
+def test_keep(solver):
+    artifacts = {"n0": lambda: 0}
+    artifacts.update(
+        {
+            "n{}".format(i): At("n{}".format(i - 1), lambda n: n + 1)
+            for i in range(1, 20)
+        }
+    )
+    artifacts["side"] = lambda n5: -n5
+    result = build(artifacts, solver=solver, keep={"n19", "side", "missing"})
+    assert result == {"n19": 19, "side": -5}
+
+
+@pytest.mark.parametrize("solver", ["linear", "bfs", "threads"])
+def test_keep_bounds_memory(solver):
+    artifacts = {"n0": lambda: _Blob()}
+    artifacts.update(
+        {"n{}".format(i): At("n{}".format(i - 1), _Blob) for i in range(1, 50)}
+    )
+    _Blob.peak = _Blob.alive = 0
+    result = build(artifacts, solver=solver, keep={"n49"})
+    assert list(result) == ["n49"]
+    assert _Blob.peak <= 3
+
+
+@pytest.mark.parametrize(
+    "solver", ["linear", "bfs", "bfs_parallel", "fork", "async", "threads"]
+)
+def test_iter_build(solver):
+    artifacts = {
+        "a": 1,
+        "b": lambda a: a + 1,
+        "c": lambda a: a * 10,
+        "d": lambda b, c: b + c,
+    }
+
+    pairs = list(iter_build(artifacts, solver=solver))
+
+    assert dict(pairs) == build(artifacts)
+    assert len(pairs) == len(artifacts)
+    assert pairs[0][0] == "a" and pairs[-1][0] == "d"
+
+
+def test_iter_build_completion_order():
+    artifacts = {"slow": lambda: time.sleep(0.5) or "slow", "fast": lambda: "fast"}
+
+    nodes = [node for node, _ in iter_build(artifacts, solver="threads")]
+
+    assert nodes == ["fast", "slow"]
+
+
+@pytest.mark.parametrize("solver", ["bfs_parallel", "fork", "async"])
+def test_iter_build_cancels(solver):
+    artifacts = {
+        "slow": lambda: time.sleep(30),
+        "fast": lambda: "fast",
+        "after": lambda slow: slow,
+    }
+    start = time.perf_counter()
+
+    for node, value in iter_build(artifacts, solver=solver, processes=2):
+        assert (node, value) == ("fast", "fast")
+        break
+
+    assert time.perf_counter() - start < 10
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.parametrize(
+    "solver", ["linear", "bfs", "bfs_parallel", "fork", "async", "threads"]
+)
+def test_stream(solver):
+    produced = []
+
+    def numbers(n):
+        for i in range(n):
+            produced.append(i)
+            yield i
+
+    artifacts = {
+        "n": 100,
+        "numbers": Stream(numbers, maxsize=2),
+        "squares": Stream(At("numbers", lambda xs: (x * x for x in xs))),
+        "total": lambda squares: sum(squares),
+        "count": lambda numbers: sum(1 for _ in numbers),
+        "evens": Stream(lambda numbers: (x for x in numbers if x % 2 == 0)),
+    }
+
+    results = build(artifacts, solver=solver)
+
+    assert results["total"] == sum(i * i for i in range(100))
+    assert results["count"] == 100
+    assert results["evens"] == list(range(0, 100, 2))
+    assert "numbers" not in results and "squares" not in results
+    assert len(produced) == 100
+
+
+@pytest.mark.parametrize("solver", ["linear", "threads", "bfs_parallel"])
+def test_stream_error(solver):
+    def chunks():
+        yield 1
+        raise ValueError("bad chunk")
+
+    artifacts = {"chunks": Stream(chunks), "total": lambda chunks: sum(chunks)}
+
+    with pytest.raises(ValueError, match="bad chunk"):
+        build(artifacts, solver=solver)
+
+
+def test_stream_fan_out_warns():
+    artifacts = {
+        "numbers": Stream(lambda: iter(range(10))),
+        "total": lambda numbers: sum(numbers),
+        "count": lambda numbers: sum(1 for _ in numbers),
+    }
+    with pytest.warns(RuntimeWarning, match="numbers"):
+        assert build(artifacts)["count"] == 10
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert build(artifacts, solver="threads")["total"] == 45
+        assert build({"numbers": artifacts["numbers"], "total": artifacts["total"]})
+
+
+def test_stream_bounded():
+    state = {"produced": 0, "ahead": 0}
+
+    def chunks():
+        for i in range(50):
+            state["produced"] += 1
+            yield i
+
+    def consume(chunks):
+        for i in chunks:
+            state["ahead"] = max(state["ahead"], state["produced"] - i)
+            time.sleep(0.001)
+        return state["ahead"]
+
+    results = build({"chunks": Stream(chunks, maxsize=4), "ahead": consume})
+
+    assert results["ahead"] <= 4 + 2
@@ -0,0 +1,180 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from artifax import Artifax, At, build
+from artifax.cache import DiskCache, PickleSerializer, content_keys, fingerprint
+
+FACTOR = 3
+CONFIG = {"scale": 2}
+
+
+def scale(x):
+    return FACTOR * x
+
+
+class Doubler:
+    def apply(self, x):
+        return 2 * x
+
+
+class Counter:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, name, value):
+        self.calls.append(name)
+        return value
+
+
+def test_fingerprint():
+    assert fingerprint(lambda x: x + 1) == fingerprint(lambda x: x + 1)
+    assert fingerprint(lambda x: x + 1) != fingerprint(lambda x: x + 2)
+    assert fingerprint(lambda x: x + 1) != fingerprint(lambda y: y + 1)
+    assert fingerprint(42) == fingerprint(42)
+    assert fingerprint(42) != fingerprint("42")
+
+    def closure(n):
+        return lambda x: x * n
+
+    assert fingerprint(closure(2)) == fingerprint(closure(2))
+    assert fingerprint(closure(2)) != fingerprint(closure(3))
+    assert fingerprint(At("a", scale)) != fingerprint(At("b", scale))
+
+    lock = __import__("threading").Lock()
+    assert fingerprint(lambda: lock) is None
+
+
+def test_fingerprint_follows_globals(monkeypatch):
+    before = fingerprint(lambda x: scale(x))
+    monkeypatch.setitem(globals(), "FACTOR", 4)
+    assert fingerprint(lambda x: scale(x)) != before
+
+    before = fingerprint(lambda x: x * CONFIG["scale"])
+    monkeypatch.setitem(CONFIG, "scale", 3)
+    assert fingerprint(lambda x: x * CONFIG["scale"]) != before
+
+    before = fingerprint(lambda x: Doubler().apply(x))
+    monkeypatch.setattr(Doubler, "apply", lambda self, x: 3 * x)
+    assert fingerprint(lambda x: Doubler().apply(x)) != before
+    assert fingerprint(lambda x: [Doubler().apply(y) for y in x]) is not None
+
+    monkeypatch.setitem(globals(), "LOCK", __import__("threading").Lock())
+    assert fingerprint(lambda: LOCK) is None
+
+
+def test_fingerprint_ignores_hash_seed():
+    script = "\n".join(
+        [
+            "from artifax.cache import fingerprint",
+            "NAMES = {'alpha', 'beta', 'gamma', 'delta'}",
+            "print(fingerprint(lambda x: x in {'alpha', 'beta', 'gamma', 'delta'}))",
+            "print(fingerprint(lambda x: x in NAMES))",
+            "print(fingerprint({'tags': frozenset(NAMES)}))",
+        ]
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    outputs = set()
+    for seed in ("1", "2", "3"):
+        env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=root)
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        assert "None" not in output
+        outputs.add(output)
+    assert len(outputs) == 1
+    assert fingerprint({1, 2}) != fingerprint({1, 3})
+    assert fingerprint({1, 2}) != fingerprint(frozenset({1, 2}))
+
+
+def test_content_keys():
+    artifacts = {"a": 1, "b": lambda a: a, "c": lambda b, z: b}
+    keys = content_keys(artifacts, ["c"])
+    assert set(keys) == {"a", "b", "c"}
+
+    changed = content_keys(dict(artifacts, a=2), ["c"])
+    assert all(keys[node] != changed[node] for node in keys)
+
+
+def test_disk_cache(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    assert "key" not in cache
+    assert cache.put("key", {"answer": 42})
+    assert "key" in cache
+    assert cache.get("key") == {"answer": 42}
+    assert not cache.put("lambda", lambda: None)
+    with pytest.raises(KeyError):
+        cache.get("lambda")
+
+    cache.clear()
+    assert "key" not in cache
+
+
+def test_disk_cache_eviction(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=3500, serializers=[PickleSerializer()])
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, bytes(1000))
+        os.utime(os.path.join(str(tmp_path), key + ".pkl"), (i, i))
+    cache.get("a")
+    cache.put("d", bytes(1000))
+    assert all(key in cache for key in ["a", "c", "d"])
+    assert "b" not in cache
+
+
+def test_cached_build(tmp_path):
+    counter = Counter()
+    artifacts = {
+        "a": 2,
+        "b": lambda a: counter("b", a * 10),
+        "c": lambda a, b: counter("c", a + b),
+    }
+    cache = DiskCache(str(tmp_path))
+    assert build(artifacts, cache=cache) == {"a": 2, "b": 20, "c": 22}
+    assert counter.calls == ["b", "c"]
+
+    counter.calls.clear()
+    assert build(artifacts, cache=cache) == {"a": 2, "b": 20, "c": 22}
+    assert not counter.calls
+
+    artifacts["c"] = lambda a, b: counter("c", a - b)
+    assert build(artifacts, cache=cache)["c"] == -18
+    assert counter.calls == ["c"]
+
+
+def test_artifax_warm_restart(tmp_path):
+    counter = Counter()
+
+    def graph():
+        return Artifax(
+            a=2,
+            b=lambda a: counter("b", a * 10),
+            c=lambda b: counter("c", b + 1),
+            d=lambda a: counter("d", a - 1),
+        ).cache(DiskCache(str(tmp_path)))
+
+    assert graph().build() == {"a": 2, "b": 20, "c": 21, "d": 1}
+    assert sorted(counter.calls) == ["b", "c", "d"]
+
+    counter.calls.clear()
+    afx = graph()
+    assert afx.build(targets="c") == 21
+    assert not counter.calls
+
+    # b, which c was loaded in place of, is not needed by the full build
+    assert afx.build() == {"a": 2, "c": 21, "d": 1}
+    assert not counter.calls
+
+    afx.set("a", 3)
+    assert afx.build(targets="c") == 31
+    assert counter.calls == ["b", "c"]
+
+    counter.calls.clear()
+    afx.set("c", lambda b: counter("c", b + 2))
+    assert afx.build(targets="c") == 32
+    assert counter.calls == ["c"]
@@ -0,0 +1,74 @@
+import pytest
+
+from artifax import (
+    At,
+    CircularDependencyError,
+    InvalidSolverError,
+    UnresolvedDependencyError,
+    build,
+    build_many,
+)
+
+
+def _graphs():
+    return [
+        {"a": 1, "b": lambda a: a + 1, "c": At("a", "b", lambda x, y: x * y)},
+        {"a": 2, "b": lambda a: a + 1},
+        {"x": lambda: 1 / 0, "y": lambda x: x + 1, "z": lambda: "ok"},
+        {"a": lambda b: b, "b": lambda a: a},
+        {"p": lambda q: q},
+    ]
+
+
+@pytest.mark.parametrize(
+    "solver", ["linear", "bfs", "bfs_parallel", "async", "threads"]
+)
+def test_build_many(solver):
+    results = build_many(_graphs(), solver=solver)
+    assert results[:2] == [build(_graphs()[0]), build(_graphs()[1])]
+    assert isinstance(results[2], ZeroDivisionError)
+    assert isinstance(results[3], CircularDependencyError)
+    assert isinstance(results[4], UnresolvedDependencyError)
+
+
+def test_build_many_resolved():
+    results = build_many(
+        [{"b": lambda a: a + 1}, {"b": lambda a: a * 10}], resolved={"a": 2}
+    )
+    assert results == [{"a": 2, "b": 3}, {"a": 2, "b": 20}]
+
+    results = build_many([{"p": lambda q, r: q + r}], allow_partial_functions=True)
+    assert results[0]["p"](1, 2) == 3
+
+    assert build_many([]) == []
+    with pytest.raises(InvalidSolverError):
+        build_many(_graphs(), solver="nope")
+
+
+def test_build_many_skips_failed_dependents():
+    calls = []
+    results = build_many(
+        [
+            {"x": lambda: calls.append("x") or 1 / 0, "y": lambda x: calls.append("y")},
+            {"z": lambda: calls.append("z") or 1},
+        ]
+    )
+    assert isinstance(results[0], ZeroDivisionError)
+    assert results[1] == {"z": 1}
+    assert sorted(calls) == ["x", "z"]
+
+
+@pytest.mark.parametrize("solver", ["linear", "bfs_parallel"])
+def test_build_many_keep(solver):
+    results = build_many(_graphs(), solver=solver, keep=["b", "z"])
+    assert results[:2] == [{"b": 2}, {"b": 3}]
+    assert isinstance(results[2], ZeroDivisionError)
+    assert isinstance(results[3], CircularDependencyError)
+
+    results = build_many(
+        [{"b": lambda a: a + 1, "c": lambda b: 1 / 0}, {"b": lambda a: a * 10}],
+        resolved={"a": 2},
+        keep=["a", "b"],
+    )
+    assert isinstance(results[0], ZeroDivisionError)
+    assert results[1] == {"a": 2, "b": 20}
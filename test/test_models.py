@@ -1,10 +1,15 @@
 import math
+import os
+import subprocess
+import sys
+import threading
+import time
 from functools import partial
 
 import pytest
 from artifax import Artifax
 from artifax.exceptions import UnresolvedDependencyError
-from artifax.utils import At
+from artifax.utils import At, Stream
 
 
 def test_add():
@@ -310,3 +315,413 @@ def test_string_targeted_build_returns_bare_result():
 def test_unary_list_targeted_build_returns_tuple():
     afx = Artifax({"a": 10, "b": 20})
     assert afx.build(targets=["a"]) == (10,)
+
+
+def test_incremental_edges():
+    afx = Artifax()
+    afx.set("c", lambda a, b: a + b)
+    assert afx.number_of_edges() == 0
+    assert afx.initial() == {"c"}
+
+    afx.set("a", 1)
+    afx.set("b", 2)
+    assert afx.number_of_edges() == 2
+    assert afx.initial() == {"a", "b"}
+
+    afx.set("c", lambda a: a)
+    assert afx.number_of_edges() == 1
+    assert afx.initial() == {"a", "b"}
+
+    afx.pop("a")
+    assert afx.number_of_edges() == 0
+    assert afx.initial() == {"b", "c"}
+
+    afx.set("a", 3)
+    assert afx.number_of_edges() == 1
+    assert afx.build(targets="c") == 3
+
+
+def test_targeted_build_skips_fresh_ancestors():
+    calls = []
+
+    def track(name, value):
+        calls.append(name)
+        return value
+
+    afx = Artifax(
+        a=1,
+        b=2,
+        x=lambda a: track("x", a * 10),
+        y=lambda b: track("y", b * 10),
+        z=lambda x, y: track("z", x + y),
+    )
+    assert afx.build(targets="z") == 30
+    assert sorted(calls) == ["x", "y", "z"]
+
+    calls.clear()
+    afx.set("b", 3)
+    assert afx.build(targets="z") == 40
+    assert sorted(calls) == ["y", "z"]
+
+    calls.clear()
+    assert afx.build(targets="z") == 40
+    assert not calls
+
+
+def test_build_feeds_fresh_dependencies():
+    afx = Artifax(a=1, c=2, b=lambda a, c: a + c)
+    assert afx.build()["b"] == 3
+
+    afx.set("a", 10)
+    assert afx.build() == {"a": 10, "c": 2, "b": 12}
+
+
+def test_setting_missing_dependency_revokes_dependents():
+    afx = Artifax(b=lambda a: a, allow_partial_functions=True)
+    assert isinstance(afx.build(targets="b"), partial)
+
+    afx.set("a", 42)
+    assert afx.build(targets="b") == 42
+
+
+def test_ancestors_and_descendants():
+    afx = Artifax(
+        a=1,
+        b=lambda a: a,
+        c=lambda a: a,
+        d=lambda b, c: b + c,
+        e=lambda d: d,
+    )
+    assert afx.ancestors("e") == {"a", "b", "c", "d"}
+    assert afx.ancestors("a") == set()
+    assert afx.descendants("a") == {"b", "c", "d", "e"}
+    assert afx.descendants("e") == set()
+
+    afx.set("d", lambda b: b)
+    assert afx.ancestors("e") == {"a", "b", "d"}
+    assert afx.descendants("c") == set()
+    assert afx.descendants("a") == {"b", "c", "d", "e"}
+
+    afx.set("a", lambda f: f)
+    assert afx.ancestors("e") == {"a", "b", "d"}
+    afx.set("f", 0)
+    assert afx.ancestors("e") == {"a", "b", "d", "f"}
+    assert afx.descendants("f") == {"a", "b", "c", "d", "e"}
+
+    afx.pop("b")
+    assert afx.ancestors("e") == {"d"}
+    assert afx.descendants("f") == {"a", "c"}
+
+    with pytest.raises(KeyError):
+        afx.ancestors("b")
+
+
+def test_diamond_ladder():
+    rungs = 200
+    afx = Artifax(n0=1)
+    for i in range(1, rungs):
+        afx.set("l{}".format(i), At("n{}".format(i - 1), lambda n: n))
+        afx.set("r{}".format(i), At("n{}".format(i - 1), lambda n: n))
+        afx.set(
+            "n{}".format(i),
+            At("l{}".format(i), "r{}".format(i), lambda l, r: max(l, r)),
+        )
+
+    top = "n{}".format(rungs - 1)
+    assert len(afx.ancestors(top)) == 3 * (rungs - 1)
+    assert afx.build(targets=top) == 1
+
+    afx.set("n0", 2)
+    assert afx.build(targets=top) == 2
+
+
+def test_parallel_build_reuses_pool():
+    def workers(afx, worker, **kwargs):
+        afx.update({"w{}".format(i): lambda: worker() for i in range(4)})
+        return set(afx.build(**kwargs).values())
+
+    with Artifax() as afx:
+        pids = workers(afx, os.getpid, solver="bfs_parallel", processes=2)
+        pids |= workers(afx, os.getpid, solver="async")
+        assert len(pids) <= 2
+        threads = workers(afx, threading.get_ident, solver="threads", max_workers=2)
+        threads |= workers(afx, threading.get_ident, solver="threads")
+        assert len(threads) <= 2
+    assert not pids & workers(afx, os.getpid, solver="async", processes=2)
+    afx.close()
+
+
+@pytest.mark.parametrize("solver", ["linear", "bfs", "threads"])
+def test_early_cutoff(solver):
+    calls = []
+    afx = Artifax(
+        x=3,
+        parity=lambda x: x % 2,
+        report=lambda parity: calls.append(parity) or "odd" * parity,
+    )
+    assert afx.build(solver=solver)["report"] == "odd"
+
+    afx.set("x", 5)
+    assert afx.build(solver=solver)["parity"] == 1
+    assert calls == [1]
+
+    afx.set("x", 4)
+    assert afx.build(solver=solver)["report"] == ""
+    assert calls == [1, 0]
+
+    afx.set("report", lambda parity: "odd" * parity + "!")
+    assert afx.build(targets="report", solver=solver) == "!"
+
+
+def test_early_cutoff_targeted_builds():
+    afx = Artifax(a=1, b=lambda a: a % 2, c=lambda b: b * 10)
+    assert afx.build(targets="c") == 10
+
+    afx.set("a", 2)
+    assert afx.build(targets="b") == 0
+    afx.set("a", 4)
+    assert afx.build(targets="b") == 0
+    assert afx.build(targets="c") == 0
+
+    calls = []
+    afx.equality(None).set("c", lambda b: calls.append(b) or b)
+    afx.build()
+    afx.set("a", 6)
+    afx.build()
+    assert calls == [0, 0]
+    assert afx.equality() is None
+
+
+def test_early_cutoff_types():
+    afx = Artifax(a=1, b=lambda a: type(a).__name__, c=lambda b: b.upper())
+    assert afx.build(targets="c") == "INT"
+
+    afx.set("a", 1.0)
+    assert afx.build(targets="c") == "FLOAT"
+
+
+def test_update():
+    calls = []
+    afx = Artifax(
+        a=1,
+        b=2,
+        c=lambda a, b: calls.append("c") or a + b,
+        d=lambda c: calls.append("d") or c * 2,
+        e=lambda: calls.append("e") or 0,
+    )
+    assert afx.build()["d"] == 6
+
+    calls.clear()
+    afx.update({"a": 10}, b=20)
+    assert afx.build() == {"a": 10, "b": 20, "c": 30, "d": 60, "e": 0}
+    assert calls == ["c", "d"]
+
+    afx.set(a=1, f=lambda d: d + 1)
+    assert afx.build(targets="f") == 43
+
+
+def test_batch():
+    calls = []
+    afx = Artifax(
+        a=1,
+        b=lambda a: calls.append("b") or a + 1,
+        c=lambda b: calls.append("c") or b + 1,
+    )
+    assert afx.descendants("a") == {"b", "c"}
+    afx.build()
+
+    with afx.batch():
+        afx.set("x", 5)
+        afx.set("b", lambda x: calls.append("b") or x * 2)
+        with afx.batch():
+            afx.set("y", lambda c: c)
+            afx.pop("y")
+        assert afx.descendants("a") == set()
+        afx.set("a", 2)
+
+    assert afx.ancestors("c") == {"b", "x"}
+    assert "y" not in afx
+    calls.clear()
+    assert afx.build() == {"a": 2, "x": 5, "b": 10, "c": 11}
+    assert calls == ["b", "c"]
+
+    with pytest.raises(ValueError):
+        with afx.batch():
+            afx.set("x", 6)
+            raise ValueError
+    assert afx.build(targets="c") == 13
+
+    afx.set("x", 7)
+    assert afx.descendants("x") == {"b", "c"}
+    assert afx.build(targets="c") == 15
+
+
+def test_keep():
+    calls = []
+    afx = Artifax(
+        a=lambda: calls.append("a") or 1,
+        b=lambda a: calls.append("b") or a + 1,
+        c=lambda b: calls.append("c") or b + 1,
+    )
+    assert afx.build(targets="c", keep={"a"}) == 3
+    assert afx.build(targets="a") == 1
+    assert afx.build(targets="b") == 2
+    assert calls == ["a", "b", "c", "b"]
+
+    afx.set("a", lambda: calls.append("a") or 1)
+    assert afx.build(targets="c") == 3
+    assert calls == ["a", "b", "c", "b", "a"]
+
+    afx.set("c", lambda b: b * 10)
+    assert afx.build(targets="c") == 20
+    assert afx.build() == {"a": 1, "b": 2, "c": 20}
+    assert calls == ["a", "b", "c", "b", "a"]
+
+
+def test_max_bytes():
+    calls = []
+    afx = Artifax(
+        a=lambda: calls.append("a") or bytes(1000),
+        b=lambda a: calls.append("b") or bytes(1000),
+        c=lambda a: calls.append("c") or bytes(1000),
+    )
+    afx.build()
+    assert afx.max_bytes(2500) is afx
+    assert afx.max_bytes() == 2500
+
+    # one of the three values had to be dropped to meet the budget and full
+    # builds do not evaluate it again as no stale node needs it
+    calls.clear()
+    afx.max_bytes(None)
+    assert len(afx.build()) == 2
+    assert not calls
+
+    afx.max_bytes(2500)
+    afx.set("d", lambda b, c: calls.append("d") or len(b + c))
+    calls.clear()
+    assert afx.build(targets="d") == 2000
+    assert "d" in calls and len(calls) <= 3
+
+    calls.clear()
+    assert afx.build(targets="d") == 2000
+    assert not calls
+
+
+def test_max_bytes_ignores_hash_seed():
+    script = "\n".join(
+        [
+            "from artifax import Artifax",
+            "calls = []",
+            "afx = Artifax(",
+            "    a=1,",
+            "    big=lambda a: calls.append('big') or bytes(10000),",
+            "    small=lambda big: len(big),",
+            ").max_bytes(2000)",
+            "print(sorted(afx.build()), sorted(afx.build()), calls)",
+        ]
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    outputs = set()
+    for seed in ("1", "2", "3", "4"):
+        env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=root)
+        outputs.add(
+            subprocess.run(
+                [sys.executable, "-c", script],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        )
+    # big is evaluated once and the least recently used values are dropped
+    assert outputs == {"['small'] ['small'] ['big']\n"}
+
+
+def test_iter_build():
+    calls = []
+    afx = Artifax(
+        a=1,
+        b=lambda a: calls.append("b") or a + 1,
+        c=lambda b: calls.append("c") or b * 10,
+    )
+
+    assert list(afx.iter_build()) == [("a", 1), ("b", 2), ("c", 20)]
+    afx.set("b", lambda a: calls.append("b") or a + 2)
+    assert list(afx.iter_build()) == [("a", 1), ("b", 3), ("c", 30)]
+    assert list(afx.iter_build(targets="c")) == [("c", 30)]
+    assert calls == ["b", "c", "b", "c"]
+
+
+def test_iter_build_stopped_early():
+    calls = []
+    afx = Artifax(
+        a=lambda: calls.append("a") or 1,
+        b=lambda a: calls.append("b") or a + 1,
+        c=lambda b: calls.append("c") or b * 10,
+    )
+
+    for node, _ in afx.iter_build():
+        if node == "b":
+            break
+
+    assert calls == ["a", "b"]
+    assert afx.build() == {"a": 1, "b": 2, "c": 20}
+    assert calls == ["a", "b", "c"]
+
+
+def test_iter_build_terminates_pool():
+    with Artifax(pid=lambda: os.getpid(), slow=lambda: time.sleep(30)) as afx:
+        start = time.perf_counter()
+        stream = afx.iter_build(solver="async", processes=2)
+        node, pid = next(stream)
+        stream.close()
+        assert node == "pid"
+        assert time.perf_counter() - start < 10
+
+        afx.pop("slow")
+        afx.set("pid", lambda: os.getpid())
+        assert afx.build(solver="async")["pid"] != pid
+
+    # running threads can not be cancelled, but closing does not wait for them
+    with Artifax(fast=lambda: 1, slow=lambda: time.sleep(5)) as afx:
+        start = time.perf_counter()
+        stream = afx.iter_build(solver="threads", max_workers=2)
+        assert next(stream) == ("fast", 1)
+        stream.close()
+        assert time.perf_counter() - start < 2
+
+        afx.pop("slow")
+        assert afx.build(solver="threads") == {"fast": 1}
+
+
+def test_stream():
+    runs = []
+
+    def chunks(n):
+        runs.append(n)
+        yield from range(n)
+
+    afx = Artifax(
+        n=1000,
+        s=Stream(chunks),
+        total=lambda s: sum(s),
+        count=lambda s: sum(1 for _ in s),
+    )
+    result = afx.build()
+    assert (result["total"], result["count"]) == (499500, 1000)
+    assert "s" not in result
+    assert runs == [1000]
+
+    # consumed streams are not evaluated again for nodes that hold values
+    result = afx.build()
+    assert "s" not in result
+    assert runs == [1000]
+
+    afx.set("total", lambda s: max(s))
+    assert afx.build(targets="total") == 999
+    assert runs == [1000, 1000]
+    assert "s" not in afx.build()
+
+    afx.set("n", 10)
+    assert afx.build(targets=("total", "count")) == (9, 10)
+    assert runs == [1000, 1000, 10]
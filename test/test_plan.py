@@ -0,0 +1,82 @@
+from functools import partial
+
+import pytest
+
+import artifax
+from artifax import Artifax, At, build
+from artifax.exceptions import CircularDependencyError, UnresolvedDependencyError
+
+
+def test_empty_plan():
+    assert artifax.compile({}).run() == {}
+
+
+def test_plan_matches_build():
+    artifacts = {
+        "A": 42,
+        "B": lambda: 7,
+        "C": lambda: 10,
+        "AB": lambda A, B: A + B,
+        "C minus B": At("C", "B", lambda c, b: c - b),
+        "greet": "Hello",
+        "msg": lambda greet, A: "{} World! The answer is {}.".format(greet, A),
+    }
+    plan = artifax.compile(artifacts)
+    assert plan.run() == build(artifacts)
+    assert list(plan.run()) == list(artifacts)
+    assert len(plan) == len(artifacts)
+    assert "AB" in plan
+
+
+def test_plan_inputs():
+    plan = artifax.compile(
+        {
+            "x": 1,
+            "y": 2,
+            "sum": lambda x, y: x + y,
+            "double": lambda sum: 2 * sum,
+        }
+    )
+    assert plan.run()["double"] == 6
+    assert plan.run(x=10)["double"] == 24
+    assert plan.run({"x": 10, "y": 0})["sum"] == 10
+    assert plan.run(sum=100) == {"x": 1, "y": 2, "sum": 100, "double": 200}
+    assert plan.run()["double"] == 6
+
+    with pytest.raises(KeyError):
+        plan.run(z=0)
+
+
+def test_plan_errors():
+    with pytest.raises(CircularDependencyError):
+        artifax.compile({"a": lambda b: b, "b": lambda a: a})
+
+    with pytest.raises(UnresolvedDependencyError):
+        artifax.compile({"a": 42, "b": lambda A: A * 2})
+
+    plan = artifax.compile(
+        {"a": 42, "b": lambda A: A * 2}, allow_partial_functions=True
+    )
+    result = plan.run()
+    assert isinstance(result["b"], partial)
+    assert result["b"](3) == 6
+
+
+def test_artifax_compile():
+    afx = Artifax(a=3, b=lambda a: a**2)
+    plan = afx.compile()
+    afx.set("a", 4)
+    assert plan.run()["b"] == 9
+    assert plan.run(a=5)["b"] == 25
+    assert afx.compile().run()["b"] == 16
+
+
+def test_star_import_keeps_builtin_compile():
+    namespace = {}
+    exec("from artifax import *", namespace)
+    assert "Plan" in namespace and "build" in namespace
+    assert "compile" not in namespace
+    # only the public API, not the modules the package happens to import
+    assert set(namespace) - {"__builtins__"} == set(artifax.__all__)
+    assert all(hasattr(artifax, name) for name in artifax.__all__)
+    assert not {"wait", "count", "time", "json", "pickle", "partial"} & set(namespace)
@@ -0,0 +1,130 @@
+import threading
+import time
+from functools import partial
+
+import pytest
+
+from artifax import Artifax, At, BuildReport, Stream, build, iter_build
+from artifax.exceptions import InvalidSolverError
+from artifax.remote import RemoteExecutor, WorkerServer
+
+
+class _Counting(RemoteExecutor):
+    def __init__(self, addresses):
+        super().__init__(addresses)
+        self.fetched = []
+
+    def fetch(self, worker, node):
+        self.fetched.append(node)
+        return super().fetch(worker, node)
+
+
+@pytest.fixture
+def servers():
+    servers = [WorkerServer() for _ in range(2)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_distributed_build(servers):
+    artifacts = {
+        "a": 2,
+        "b": lambda a: a + 1,
+        "c": lambda a: a * 3,
+        "d": lambda b, c: b * c,
+        "e": lambda d, z: [d, z],
+    }
+    with RemoteExecutor([server.address for server in servers]) as executor:
+        result = build(
+            artifacts, solver="distributed", executor=executor, resolved={"z": 0}
+        )
+        assert result == build(artifacts, resolved={"z": 0})
+    assert all(not server.values and not server.functions for server in servers)
+
+
+def test_distributed_locality(servers):
+    def step(x):
+        return x + 1
+
+    artifacts = {"n0": 0}
+    artifacts.update(
+        {"n{}".format(i): At("n{}".format(i - 1), step) for i in range(1, 8)}
+    )
+    report = BuildReport()
+    with RemoteExecutor([server.address for server in servers]) as executor:
+        result = build(
+            artifacts, solver="distributed", executor=executor, report=report
+        )
+
+    assert result["n7"] == 7
+    assert len(report.workers()) == 1
+    assert [server.received for server in servers] == [0, 0]
+    assert sum(server.defined for server in servers) == 1
+
+
+def test_distributed_keep(servers):
+    artifacts = {
+        "a": lambda: bytes(2**20),
+        "b": lambda a: len(a),
+        "c": lambda b: b * 10,
+    }
+    with _Counting([server.address for server in servers]) as executor:
+        result = build(artifacts, solver="distributed", executor=executor, keep={"c"})
+        assert result == {"c": 10 * 2**20}
+        assert executor.fetched == ["c"]
+
+
+def test_distributed_iter_build(servers):
+    artifacts = {"a": lambda: 1, "b": lambda a: a + 1, "c": lambda b: b * 10}
+    with _Counting([server.address for server in servers]) as executor:
+        pairs = list(
+            iter_build(artifacts, solver="distributed", executor=executor, keep={"c"})
+        )
+        assert pairs == [("a", 1), ("b", 2), ("c", 20)]
+        assert sorted(executor.fetched) == ["a", "b", "c", "c"]
+
+
+def test_distributed_cutoff(servers):
+    afx = Artifax(a=1, b=lambda a: a % 2, c=lambda b: b * 10)
+    rebuild = partial(afx.build, targets="c", keep=(), solver="distributed")
+    with _Counting([server.address for server in servers]) as executor:
+        assert rebuild(executor=executor) == 10
+        afx.set("a", 3)
+        assert rebuild(executor=executor) == 10
+        afx.set("a", 4)
+        assert rebuild(executor=executor) == 0
+        assert executor.fetched == ["c", "c", "c"]
+
+
+def test_distributed_errors(servers):
+    artifacts = {"a": 0, "b": lambda a: 1 / a, "c": lambda b: b}
+    with RemoteExecutor([server.address for server in servers]) as executor:
+        with pytest.raises(ZeroDivisionError):
+            build(artifacts, solver="distributed", executor=executor)
+        assert build({"a": lambda: 3}, solver="distributed", executor=executor) == {
+            "a": 3
+        }
+
+
+def test_distributed_busy_workers(servers):
+    with RemoteExecutor([]) as executor:
+        with pytest.raises(InvalidSolverError):
+            build({"a": 1}, solver="distributed", executor=executor)
+
+    artifacts = {
+        "slow1": lambda: time.sleep(0.5) or 1,
+        "slow2": lambda: time.sleep(0.5) or 2,
+        "s": Stream(lambda: iter(range(4))),
+        "total": lambda s: sum(s),
+    }
+    with RemoteExecutor([server.address for server in servers]) as executor:
+        order = [
+            node
+            for node, _ in iter_build(artifacts, solver="distributed", executor=executor)
+        ]
+    # local nodes do not wait for a worker to be idle
+    assert order.index("total") < min(order.index("slow1"), order.index("slow2"))
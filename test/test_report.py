@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from artifax import Artifax, BuildReport, abuild, build
+
+ARTIFACTS = {
+    "a": 1,
+    "b": lambda a: [a] * 100,
+    "c": lambda a: time.sleep(0.01) or a,
+    "d": lambda b, c: len(b) + c,
+}
+
+
+@pytest.mark.parametrize(
+    "solver", ["linear", "bfs", "bfs_parallel", "fork", "async", "threads"]
+)
+def test_report(solver):
+    report = BuildReport()
+    events = []
+    build(
+        ARTIFACTS,
+        solver=solver,
+        report=report,
+        on_node_start=lambda node: events.append(("start", node)),
+        on_node_end=lambda node, record: events.append(("end", node)),
+        resolved={"z": 0},
+    )
+    assert set(report.records) == {"a", "b", "c", "d"}
+    assert len(report) == 4
+    for node, record in report.records.items():
+        assert record.node == node
+        assert events.index(("start", node)) < events.index(("end", node))
+        assert record.queued <= record.start <= record.end
+        assert record.worker[0] > 0
+    assert report.records["c"].wall >= 0.01
+    assert report.records["c"].cpu < report.records["c"].wall
+    assert report.records["b"].size > report.records["a"].size
+    assert report.start <= report.records["a"].queued
+    assert report.records["d"].end <= report.end
+    assert report.busy <= report.wall * len(report.workers())
+    assert report.slowest(1)[0].node == "c"
+
+
+def test_report_workers():
+    report = BuildReport()
+    build(ARTIFACTS, solver="threads", max_workers=2, report=report)
+    assert {pid for pid, _ in report.workers()} == {os.getpid()}
+
+    report = BuildReport()
+    build(ARTIFACTS, solver="async", processes=2, report=report)
+    assert os.getpid() not in {pid for pid, _ in report.workers()}
+
+
+def test_abuild_report():
+    async def fetch(a):
+        await asyncio.sleep(0.01)
+        return a
+
+    report = BuildReport()
+    asyncio.run(abuild({"a": 1, "b": fetch, "c": lambda b: b}, report=report))
+    assert set(report.records) == {"a", "b", "c"}
+    assert report.records["b"].cpu is None
+    assert report.records["b"].wall >= 0.01
+    assert report.records["c"].cpu is not None
+
+
+def test_artifax_report():
+    afx = Artifax(a=1, b=lambda a: a + 1, c=lambda a: a - 1)
+    report = BuildReport()
+    afx.build(report=report)
+    assert set(report.records) == {"a", "b", "c"}
+
+    afx.set("b", lambda a: a + 2)
+    report = BuildReport()
+    afx.build(report=report)
+    assert set(report.records) == {"b"}
+
+
+def test_chrome_trace(tmp_path):
+    report = BuildReport()
+    build(ARTIFACTS, solver="threads", report=report)
+    path = str(tmp_path / "trace.json")
+    report.save_chrome_trace(path)
+    with open(path) as handle:
+        trace = json.load(handle)
+    events = {event["name"]: event for event in trace["traceEvents"]}
+    assert set(events) == {"a", "b", "c", "d"}
+    assert all(event["ph"] == "X" for event in events.values())
+    assert events["c"]["dur"] >= 10000
+    assert events["d"]["ts"] >= events["c"]["ts"] + events["c"]["dur"]
+    assert events["b"]["args"]["size"] == report.records["b"].size
@@ -0,0 +1,88 @@
+import pytest
+
+from artifax import Artifax, At, Vectorized, sweep
+
+
+def test_sweep():
+    calls = []
+    artifacts = {
+        "base": lambda: calls.append("base") or 10,
+        "y": lambda x, base: calls.append("y") or x + base,
+        "z": lambda y: y * 2,
+    }
+    points = sweep(artifacts, over={"x": [1, 2, 3]})
+    assert [point["z"] for point in points] == [22, 24, 26]
+    assert [point["x"] for point in points] == [1, 2, 3]
+    assert all(point["base"] == 10 for point in points)
+    assert calls.count("base") == 1
+    assert calls.count("y") == 3
+
+    assert sweep(artifacts, over={"x": []}) == []
+    with pytest.raises(ValueError):
+        sweep(artifacts, over={"x": [1, 2], "base": [1]})
+
+
+def test_sweep_node():
+    artifacts = {"x": 1, "y": 2, "z": lambda x, y: x * y}
+    points = sweep(artifacts, over={"x": [3, 4], "y": [5, 6]})
+    assert [point["z"] for point in points] == [15, 24]
+    assert [point["y"] for point in points] == [5, 6]
+
+
+def test_sweep_vectorized():
+    calls = []
+    artifacts = {
+        "base": 10,
+        "v": Vectorized(
+            lambda x, base: calls.append("v") or [value * base for value in x]
+        ),
+        "w": Vectorized(
+            At("v", "x", lambda v, x: calls.append("w") or [a + b for a, b in zip(v, x)])
+        ),
+        "z": lambda w: w * 2,
+    }
+    points = sweep(artifacts, over={"x": [1, 2, 3]})
+    assert [point["v"] for point in points] == [10, 20, 30]
+    assert [point["w"] for point in points] == [11, 22, 33]
+    assert [point["z"] for point in points] == [22, 44, 66]
+    assert calls == ["v", "w"]
+
+    artifacts = {"v": Vectorized(lambda x: [0])}
+    with pytest.raises(ValueError):
+        sweep(artifacts, over={"x": [1, 2]})
+
+
+@pytest.mark.parametrize("solver", ["bfs", "bfs_parallel", "async", "threads"])
+def test_sweep_solvers(solver):
+    artifacts = {
+        "base": 10,
+        "y": lambda x, base: x + base,
+        "v": Vectorized(lambda y: [value * 2 for value in y]),
+    }
+    points = sweep(artifacts, over={"x": [1, 2, 3]}, solver=solver)
+    assert [point["v"] for point in points] == [22, 24, 26]
+
+
+def test_artifax_sweep():
+    calls = []
+    afx = Artifax(
+        {
+            "base": lambda: calls.append("base") or 10,
+            "y": lambda x, base: x + base,
+            "z": lambda y: y * 2,
+            "other": lambda base: base + 1,
+        },
+        x=0,
+    )
+    assert afx.sweep({"x": [1, 2]}, targets="z") == [22, 24]
+    assert afx.sweep({"x": [1, 2]}, targets=("y", "base")) == [(11, 10), (12, 10)]
+    assert afx.sweep({"x": [1]})[0] == {
+        "base": 10,
+        "y": 11,
+        "z": 22,
+        "other": 11,
+        "x": 1,
+    }
+    assert calls == ["base"]
+    # the swept node keeps its own value
+    assert afx.build(targets="z") == 20
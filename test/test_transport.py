@@ -0,0 +1,106 @@
+import array
+import mmap
+import os
+
+import pytest
+
+pytest.importorskip("multiprocessing.shared_memory")
+
+from artifax import build  # pylint: disable=C0413
+from artifax.transport import SharedMemoryTransport, _remote  # pylint: disable=C0413
+
+SOLVERS = ["bfs_parallel", "async"]
+
+
+def _segments():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+@pytest.mark.parametrize("solver", SOLVERS)
+def test_shared_memory(solver):
+    blob = b"x" * 4096
+    artifacts = {
+        "blob": blob,
+        "size": lambda blob: len(blob),
+        "head": lambda blob: bytearray(blob[:2048]),
+        "kind": lambda head: type(head).__name__,
+        "doubles": lambda: memoryview(array.array("d", range(1024))),
+        "view": lambda doubles: (doubles.readonly, doubles.format, doubles[3]),
+        "echo": lambda doubles: doubles,
+        "small": lambda: b"y",
+    }
+    before = _segments()
+
+    results = build(artifacts, solver=solver, processes=2, shared_memory=1024)
+
+    assert results["size"] == 4096
+    assert results["head"] == bytearray(b"x" * 2048)
+    assert results["kind"] == "bytearray"
+    assert results["view"] == (True, "d", 3.0)
+    assert results["echo"].tolist() == list(map(float, range(1024)))
+    assert results["echo"].readonly
+    assert results["small"] == b"y"
+    assert _segments() == before
+
+
+@pytest.mark.parametrize("solver", SOLVERS)
+def test_shared_memory_failed_build(solver):
+    def fail(head):
+        raise ValueError(len(head))
+
+    artifacts = {
+        "head": lambda: b"x" * 4096,
+        "tail": lambda: b"z" * 4096,
+        "fail": fail,
+    }
+    before = _segments()
+
+    with pytest.raises(ValueError):
+        build(artifacts, solver=solver, processes=2, shared_memory=1024)
+
+    assert _segments() == before
+
+
+def test_shared_memory_ships_once():
+    transport = SharedMemoryTransport(min_bytes=16)
+    blob = bytearray(64)
+    try:
+        first = transport.ship("a", (None, blob, 1))
+        second = transport.ship("b", (None, blob, b"tiny"))
+        assert first[0] != second[0]
+        assert first[2] == second[2]
+        assert first[3] == 1 and second[3] == b"tiny"
+    finally:
+        transport.close()
+
+
+def test_shared_memory_receives_views():
+    transport = SharedMemoryTransport(min_bytes=16)
+    before = _segments()
+    try:
+        results = {}
+        for node, blob in [("view", memoryview(bytearray(64))), ("bytes", bytes(64))]:
+            name, spec = transport.ship(node, (None,))
+            result = _remote(lambda spec: (blob, 0), 16, name, spec)
+            results[node], _ = transport.receive(node, result)
+        assert isinstance(results["view"].obj, mmap.mmap)
+        assert results["view"].readonly
+        assert results["bytes"] == bytes(64)
+    finally:
+        transport.close()
+    assert results["view"].tobytes() == bytes(64)
+    assert _segments() == before
+
+
+def test_shared_memory_numpy():
+    np = pytest.importorskip("numpy")
+    artifacts = {
+        "x": np.arange(200000, dtype=np.float64),
+        "y": lambda x: x * 2,
+        "writeable": lambda x: x.flags.writeable,
+    }
+
+    results = build(artifacts, solver="bfs_parallel", shared_memory=True)
+
+    assert np.array_equal(results["y"], np.arange(200000) * 2.0)
+    assert results["writeable"] is False
@@ -1,4 +1,19 @@
-from artifax.utils import arglist
+import pytest
+
+from artifax import build, utils
+from artifax.exceptions import CircularDependencyError
+from artifax.utils import (
+    At,
+    arglist,
+    critical_path,
+    equal,
+    fusion,
+    node_spec,
+    positional_signature,
+    to_graph,
+    topological_sort,
+)
+
 
 def test_arglist():
 
@@ -12,3 +27,148 @@ def test_arglist():
     functools.update_wrapper(wrapper, f)
 
     assert set(arglist(f)) == set(arglist(wrapper))
+
+
+def test_node_spec():
+    def f(a, b):
+        return a + b
+
+    spec = node_spec(f)
+    assert spec.args == ("a", "b")
+    assert spec.is_callable and not spec.is_at
+    assert spec.arity == 2
+    assert node_spec(f) == spec
+
+    at = At("x", "y", "z", f)
+    spec = node_spec(at)
+    assert spec.args == ("x", "y", "z")
+    assert spec.is_at and spec.value is f
+    assert spec.arity == 2
+
+    spec = node_spec(42)
+    assert spec.args == () and spec.value == 42 and not spec.is_callable
+
+
+
+def test_positional_signature():
+    class Stand:
+        __signature__ = positional_signature(3)
+
+        def __call__(self, *args):
+            return args
+
+    assert str(positional_signature(2)) == "(x0, x1, /)"
+    assert node_spec(Stand()).args == ("x0", "x1", "x2")
+    assert node_spec(At("a", "b", "c", Stand())).arity == 3
+
+
+def test_node_spec_eviction():
+    f = lambda a: a
+    node_spec(f)
+    key = id(f)
+    assert key in utils._specs
+    del f
+    assert key not in utils._specs
+
+
+def test_rebuild_does_not_inspect_signatures(monkeypatch):
+    artifacts = {
+        "a": 1,
+        "b": lambda a: a + 1,
+        "c": At("a", "b", lambda x, y: x * y),
+    }
+    assert build(artifacts)["c"] == 2
+
+    calls = []
+    original = utils.signature
+    monkeypatch.setattr(utils, "signature", lambda v: calls.append(v) or original(v))
+    for solver in ["linear", "bfs"]:
+        assert build(artifacts, solver=solver)["c"] == 2
+    assert not calls
+
+
+def test_to_graph():
+    graph = to_graph(
+        {
+            "a": 1,
+            "b": lambda a: a,
+            "c": At("a", "b", "a", lambda x, y, z: x),
+            "d": lambda missing: missing,
+        }
+    )
+    assert graph == {"a": ["b", "c"], "b": ["c"], "c": [], "d": []}
+
+
+def test_topological_sort_deep_chain():
+    depth = 100000
+    graph = {i: [i + 1] for i in range(depth)}
+    graph[depth] = []
+    assert topological_sort(graph) == list(range(depth + 1))
+
+
+def test_topological_sort_reports_cycle():
+    graph = {
+        "root": ["a"],
+        "a": ["b"],
+        "b": ["c"],
+        "c": ["a", "leaf"],
+        "leaf": [],
+    }
+    with pytest.raises(CircularDependencyError) as excinfo:
+        topological_sort(graph)
+    assert excinfo.value.nodes == ["a", "b", "c"]
+
+
+def test_critical_path():
+    graph = {"a": ["b", "c"], "b": ["d"], "c": [], "d": []}
+    assert critical_path(graph, {"a": 1, "b": 2, "c": 5, "d": 1}) == {
+        "a": 6,
+        "b": 3,
+        "c": 5,
+        "d": 1,
+    }
+    assert critical_path(graph, {}) == {"a": 3, "b": 2, "c": 1, "d": 1}
+    assert critical_path(graph, {"a": 2, "c": 4})["b"] == 6
+
+
+def test_fusion():
+    graph = {"a": ["b", "c"], "b": ["d"], "c": ["e"], "d": ["e"], "e": []}
+    assert fusion(graph) == {"b": ("b", "d")}
+    assert fusion(graph, {"b": 1, "c": 1, "d": 1, "e": 1}, cheap=1) == {
+        "a": ("a", "b", "c", "d", "e")
+    }
+    assert fusion(graph, {"c": 1}, cheap=1) == {"a": ("a", "c"), "b": ("b", "d")}
+    assert fusion(graph, exclude=["d"]) == {}
+    assert fusion({"a": ["b"], "b": ["c"], "c": []}) == {"a": ("a", "b", "c")}
+
+
+class _Elementwise(list):
+    """list whose comparison is element-wise, like an array's"""
+
+    shape = property(len)
+
+    def __eq__(self, other):
+        return _Elementwise(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def all(self):
+        return all(self)
+
+
+def test_equal():
+    assert equal(1, 1)
+    assert not equal(1, 1.0)
+    assert not equal(1, True)
+    assert equal([1, (2, "x")], [1, (2, "x")])
+    assert not equal([1, 2], [1, 2.0])
+    assert not equal([1, 2], (1, 2))
+    assert equal({"a": [1]}, {"a": [1]})
+    assert not equal({"a": 1}, {"a": 1.0})
+    assert not equal("a", "b")
+    assert equal(_Elementwise([1, 2]), _Elementwise([1, 2]))
+    assert not equal(_Elementwise([1, 2]), _Elementwise([1, 3]))
+    assert not equal(_Elementwise([1, 2]), _Elementwise([1, 2, 3]))
+    assert not equal(_Elementwise([1, 2]), [1, 2])
+    nan = float("nan")
+    assert equal(nan, nan)